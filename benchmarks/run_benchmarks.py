@@ -0,0 +1,481 @@
+# run_benchmarks.py
+# per-stage throughput and memory benchmarks using synthetic devices
+#
+# usage: python benchmarks/run_benchmarks.py [--help]
+# runs offline; the display is headless (SDL dummy video driver).
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import serial_vis
+from serial_vis import buffer_lib
+from serial_vis import serial_lib
+from serial_vis import util_lib
+from synthetic import *
+
+
+#   --------------------------------
+#
+#   utilities
+#
+#   --------------------------------
+
+def measure(function, memory):
+
+    """
+    Run function, returning (its return value, seconds, peak traced bytes).
+    Peak memory is only traced if memory is True, since tracing slows the
+    stage down.
+    """
+
+    if(memory):
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start_time
+    peak = 0
+    if(memory):
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return((result, elapsed, peak))
+
+
+def report(name, stream, count, unit, elapsed, peak, extra=""):
+
+    """
+    Print one result row.
+    """
+
+    memory = "%10.2f MB" % (peak / 1e6) if peak > 0 else "%13s" % "-"
+    print(
+        "%-10s %-12s %12.0f %-8s %9.1f ms %s  %s" % (
+            name, stream, count / elapsed, unit + "/s", elapsed * 1000,
+            memory, extra))
+
+
+def make_settings(args, mode, **kwargs):
+
+    """
+    Create settings for a synthetic device.
+    """
+
+    settings = util_lib.sv_settings()
+    settings.update({
+        "number_mode": mode,
+        "verify": args.verify,
+        "confirmation": False,
+        "queue_size": 10 ** 7})
+    settings.update(kwargs)
+    return(settings)
+
+
+def make_serial_vis(args, mode, log_name):
+
+    """
+    Create a headless serial_vis instance with no connected device.
+    """
+
+    sv = serial_vis.serial_vis(
+        path="",
+        number_mode=mode,
+        verify=args.verify,
+        log_output_name=log_name,
+        threaded_ingest=False,
+        frame_limit=0,
+        show_stats=False)
+    return(sv)
+
+
+def add_device(sv, name, settings, transport):
+
+    """
+    Register a synthetic threaded_serial device with a serial_vis instance.
+    The reader thread is not started.
+    """
+
+    device = serial_lib.threaded_serial(
+        settings, sv.error_handler, sv.user_commands)
+    device.serial_device.device = transport
+    device.device_connected = True
+
+    sv.settings[name] = settings
+    sv.serial_device[name] = device
+    sv.connect_device[name] = True
+    return(device)
+
+
+#   --------------------------------
+#
+#   stages
+#
+#   --------------------------------
+
+def bench_stages(args, kind, mode, log_name):
+
+    """
+    Benchmark each pipeline stage in isolation for one stream kind.
+    """
+
+    stream = synthetic_stream(kind, mode, args.verify, args.size, args.seed)
+    lines = stream.frames(args.frames)
+    label = kind + "/" + mode
+
+    settings = make_settings(args, mode)
+    errors = util_lib.error_handler(settings)
+
+    # read: ascii_device.get_line, including checksum verification
+    device = serial_lib.ascii_device(settings, errors)
+    device.device = memory_transport(lines)
+    result, elapsed, peak = measure(
+        lambda: [device.get_line()[0] for line in lines], args.memory)
+    report("read", label, len(lines), "line", elapsed, peak,
+           "%.1f MB/s" % (device.bytes_read / elapsed / 1e6))
+    checked = result
+
+    # parse: ascii_parser.process_command
+    parser = serial_lib.ascii_parser({}, settings, errors)
+    result, elapsed, peak = measure(
+        lambda: [parser.process_command(line) for line in checked],
+        args.memory)
+    report("parse", label, len(checked), "instr", elapsed, peak,
+           "%.1f%% cached" % (
+               100.0 * parser.cache_hits / max(len(checked), 1)))
+    instructions = result
+
+    # queue: threaded_serial enqueue and drain
+    reader = serial_lib.threaded_serial(settings, errors, {})
+
+    def queue():
+        drained = 0
+        for i, instruction in enumerate(instructions):
+            reader.enqueue(instruction)
+            if(i % 1000 == 999):
+                drained += len(reader.get_instructions())
+        return(drained + len(reader.get_instructions()))
+    result, elapsed, peak = measure(queue, args.memory)
+    report("queue", label, len(instructions), "instr", elapsed, peak)
+
+    # log: csv_log.log_data, including flushing the writer thread
+    log_instructions = [
+        i for i in instructions
+        if i[0] in ("logs", "logf", "logstart", "logend")]
+    if(len(log_instructions) > 0):
+        log = util_lib.csv_log(make_settings(
+            args, mode, log_output_name=log_name))
+
+        def write_log():
+            for instruction in log_instructions:
+                log.log_data(instruction)
+            log.close_file()
+        result, elapsed, peak = measure(write_log, args.memory)
+        report("log", label, log.records_written, "record", elapsed, peak)
+
+        # column: column_log.log_data, including flushing the writer thread
+        column_name = os.path.splitext(log_name)[0] + ".svc"
+        log = util_lib.column_log(make_settings(
+            args, mode, column_log_name=column_name))
+
+        def write_columns():
+            for instruction in log_instructions:
+                log.log_data(instruction)
+            log.close_file()
+        result, elapsed, peak = measure(write_columns, args.memory)
+        report("column", label, log.records_written, "value", elapsed, peak,
+               "%.2f MB" % (os.path.getsize(column_name) / 1e6))
+
+    # ingest: serial_vis.service_device into the buffer manager and log
+    sv = make_serial_vis(args, mode, log_name)
+    sv.settings["main"].max_size_forward = args.frames
+    sv.settings["main"].max_size_backward = args.frames
+    device = add_device(sv, "bench", make_settings(
+        args, mode,
+        max_size_forward=args.frames,
+        max_size_backward=args.frames), memory_transport(lines))
+    for instruction in instructions:
+        device.enqueue(instruction)
+    result, elapsed, peak = measure(
+        lambda: sv.service_device("bench"), args.memory)
+    history = sv.buffer_manager.get_history_info("bench")
+    report("ingest", label, len(instructions), "instr", elapsed, peak,
+           "history %d frames %.2f MB" % (history[0], history[1] / 1e6))
+
+    # history: delta-encoded storage against full frames, and rebuilding
+    # every frame with an empty materialized frame cache
+    db = sv.buffer_manager.buffer_db["bench"]
+    frames = [db.get_buffer(i) for i in sorted(db.frame_buffers)]
+
+    def store(delta_history):
+        history = buffer_lib.buffer_db(make_settings(
+            args, mode,
+            max_size_forward=args.frames,
+            max_size_backward=args.frames,
+            delta_history=delta_history))
+        for frame in frames:
+            copy = buffer_lib.frame_buffer()
+            copy.instructions = frame.instructions
+            history.new_buffer(copy)
+        history.materialized.clear()
+        return(history)
+    full = store(False)
+    history = store(True)
+
+    def rebuild():
+        return([history.get_buffer(i) for i in sorted(history.frame_buffers)])
+    result, elapsed, peak = measure(rebuild, args.memory)
+    report("history", label, len(frames), "frame", elapsed, peak,
+           "%.2f MB full, %.2f MB delta" % (
+               full.memory_usage() / 1e6, history.memory_usage() / 1e6))
+
+    # render: headless default_vector_graphics
+
+    def render():
+        for frame in frames:
+            sv.graphics_window.update_screen({"bench": frame}, False, None)
+    result, elapsed, peak = measure(render, args.memory)
+    report("render", label, len(frames), "frame", elapsed, peak,
+           "%d static layer hits" % (
+               sv.graphics_window.cache_stats["static"][0]))
+
+    for log in sv.log_sinks:
+        log.close_file()
+
+
+def bench_pipeline(args, mode, log_name):
+
+    """
+    Benchmark the full threaded pipeline with several mixed-stream devices
+    running at once, for args.duration seconds.
+    """
+
+    sv = make_serial_vis(args, mode, log_name)
+    transports = []
+    devices = {}
+
+    for i in range(args.devices):
+        stream = synthetic_stream(
+            "mixed", mode, args.verify, args.size, args.seed + i)
+        lines = stream.frames(args.frames)
+        settings = make_settings(args, mode, path="bench" + str(i))
+
+        if(args.transport == "pty"):
+            transport = pty_transport(lines)
+            transport.start()
+            transports.append(transport)
+            settings.path = transport.path
+            device = add_device(sv, "bench" + str(i), settings, None)
+            device.device_connected = False
+        else:
+            device = add_device(
+                sv, "bench" + str(i), settings, memory_transport(lines))
+        devices["bench" + str(i)] = device
+
+    for device in devices.values():
+        device.start()
+
+    # render loop; device servicing happens on the same thread, since
+    # threaded_ingest is disabled to keep the measurement deterministic
+    rendered = 0
+    start_time = time.perf_counter()
+    while(time.perf_counter() - start_time < args.duration):
+        sv.update()
+        rendered += 1
+    elapsed = time.perf_counter() - start_time
+
+    for device in devices.values():
+        device.done = True
+    for device in devices.values():
+        device.join()
+    for transport in transports:
+        transport.close()
+
+    instructions = sum(d.instruction_count for d in devices.values())
+    frames = sum(
+        sv.buffer_manager.buffer_db[name].input_buffer
+        for name in devices if name in sv.buffer_manager.buffer_db)
+    label = "%dx mixed/%s" % (args.devices, mode)
+    report("pipeline", label, instructions, "instr", elapsed, 0,
+           "%.0f frames/s ingested, %.0f updates/s rendered" % (
+               frames / elapsed, rendered / elapsed))
+
+    for log in sv.log_sinks:
+        log.close_file()
+
+
+def bench_scaling(args, mode, log_name):
+
+    """
+    Benchmark ingest with 1 up to max(args.devices, 4) mixed-stream devices
+    at full rate, and check that the devices are isolated: each device's
+    frames hold only its own instructions, and no parser, queue or frame
+    database is shared. Devices are serviced in turn, a few instructions
+    at a time, so their frames are built concurrently. Ingest time per
+    device should stay flat as devices are added; a time per device more
+    than args.scaling_limit times that of a single device is a failure.
+
+    Returns the isolation and scaling failures; empty if every check
+    passed.
+    """
+
+    counts = [1]
+    while(counts[-1] < max(args.devices, 4)):
+        counts.append(min(counts[-1] * 2, max(args.devices, 4)))
+
+    failures = []
+    base_time = None
+    for count in counts:
+        sv = make_serial_vis(args, mode, log_name)
+        devices = {}
+        instructions = {}
+
+        for i in range(count):
+            name = "scale" + str(i)
+            stream = synthetic_stream(
+                "mixed", mode, args.verify, args.size, args.seed + i)
+            lines = stream.frames(args.frames)
+            device = add_device(sv, name, make_settings(
+                args, mode,
+                max_size_forward=args.frames,
+                max_size_backward=args.frames), memory_transport(lines))
+
+            # read and parse with the device's own reader, as its thread
+            # would
+            instructions[name] = [
+                device.serial_parser.process_command(
+                    device.serial_device.get_line()[0]) for line in lines]
+            devices[name] = device
+
+        def ingest():
+            chunk = 7
+            longest = max(len(i) for i in instructions.values())
+            for start in range(0, longest, chunk):
+                for name, device in devices.items():
+                    for instruction in instructions[name][
+                            start:start + chunk]:
+                        device.enqueue(instruction)
+                    sv.service_device(name)
+        result, elapsed, peak = measure(ingest, args.memory)
+
+        # isolation checks
+        errors = []
+        shared = [
+            ("parser commands",
+             [d.serial_parser.commands for d in devices.values()]),
+            ("instruction queue",
+             [d.instruction_buffer for d in devices.values()]),
+            ("frame database",
+             [sv.buffer_manager.buffer_db[name].frame_buffers
+              for name in devices])]
+        for label, objects in shared:
+            if(len(set(id(item) for item in objects)) != len(objects)):
+                errors.append(label + " shared")
+
+        for name in devices:
+            own = set(id(i) for i in instructions[name])
+            draws = sum(1 for i in instructions[name] if i[0] == "draw")
+            db = sv.buffer_manager.buffer_db[name]
+            if(db.input_buffer != draws):
+                errors.append(
+                    name + " stored " + str(db.input_buffer) + " of " +
+                    str(draws) + " frames")
+            for frame_id in db.frame_buffers:
+                frame = db.get_buffer(frame_id)
+                if(any(id(i) not in own for i in frame.instructions)):
+                    errors.append(name + " has foreign instructions")
+                    break
+
+        # pausing one device leaves the others live
+        if(count > 1):
+            sv.buffer_manager.change_buffer(0, "scale0")
+            if(sv.buffer_manager.is_live["scale0"] or
+               not all(sv.buffer_manager.is_live[name]
+                       for name in devices if name != "scale0")):
+                errors.append("pause shared")
+
+        # time per device, relative to a single device
+        if(base_time is None):
+            base_time = elapsed
+        ratio = elapsed / count / base_time
+        total = sum(len(i) for i in instructions.values())
+        label = "%dx mixed/%s" % (count, mode)
+        report("scaling", label, total, "instr", elapsed, peak,
+               "%.2fx time/device, isolation %s" % (
+                   ratio,
+                   "ok" if len(errors) == 0 else "FAILED: " +
+                   ", ".join(errors)))
+
+        if(args.scaling_limit > 0 and ratio > args.scaling_limit):
+            errors.append("%.2fx time/device, over the %.2fx limit" % (
+                ratio, args.scaling_limit))
+
+        for log in sv.log_sinks:
+            log.close_file()
+
+        failures += [label + ": " + error for error in errors]
+
+    return(failures)
+
+
+#   --------------------------------
+#
+#   main
+#
+#   --------------------------------
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="serial-vis synthetic device benchmarks")
+    parser.add_argument("--frames", type=int, default=200,
+                        help="frames per stream")
+    parser.add_argument("--size", type=int, default=200,
+                        help="primitives or log values per frame")
+    parser.add_argument("--mode", choices=["hex", "dec", "both"],
+                        default="both", help="number mode")
+    parser.add_argument("--verify", type=int, default=2,
+                        help="checksum size; 0 to disable")
+    parser.add_argument("--streams", nargs="+",
+                        default=synthetic_stream.kinds,
+                        choices=synthetic_stream.kinds)
+    parser.add_argument("--devices", type=int, default=4,
+                        help="devices in the pipeline benchmark, and the "
+                        "most devices in the scaling benchmark (at least 4)")
+    parser.add_argument("--scaling-limit", type=float, default=3.0,
+                        help="most time per device in the scaling "
+                        "benchmark, relative to one device; 0 to disable")
+    parser.add_argument("--duration", type=float, default=3.0,
+                        help="pipeline benchmark duration (seconds)")
+    parser.add_argument("--transport", choices=["memory", "pty"],
+                        default="memory")
+    parser.add_argument("--memory", action="store_true",
+                        help="trace peak memory (slows each stage down)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    modes = ["hex", "dec"] if args.mode == "both" else [args.mode]
+    log_name = os.path.join(tempfile.mkdtemp(), "bench_log.csv")
+
+    print("%-10s %-12s %12s %-8s %12s %13s" % (
+        "stage", "stream", "rate", "", "time", "peak memory"))
+    failures = []
+    for mode in modes:
+        for kind in args.streams:
+            bench_stages(args, kind, mode, log_name)
+        failures += bench_scaling(args, mode, log_name)
+        bench_pipeline(args, mode, log_name)
+
+    # isolation failures are bugs; time per device over the limit means
+    # that per-device work grows with the number of devices
+    if(len(failures) > 0):
+        print("\nscaling FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# synthetic.py
+# synthetic instruction streams and in-memory / pty transports for benchmarks
+
+import os
+import random
+import struct
+import threading
+
+
+#   --------------------------------
+#
+#   argument encoding
+#
+#   --------------------------------
+
+def encode_int(value, number_mode):
+
+    """
+    Encode an integer argument; 16 bit in hex mode.
+    """
+
+    if(number_mode == "hex"):
+        return("%04x" % (value & 0xFFFF))
+    return(str(value))
+
+
+def encode_float(value, number_mode):
+
+    """
+    Encode a float argument; single precision in hex mode.
+    """
+
+    if(number_mode == "hex"):
+        return("%08x" % struct.unpack("!I", struct.pack("!f", value))[0])
+    return(repr(value))
+
+
+def encode_line(opcode, arguments, verify):
+
+    """
+    Build one line of the ascii protocol, including its checksum.
+
+    Parameters
+    ----------
+    opcode : str
+        Instruction opcode
+    arguments : str[]
+        Already encoded arguments
+    verify : int
+        Checksum size in hex characters, as in sv_settings.verify
+
+    Returns
+    -------
+    str
+        Encoded line, without a newline
+    """
+
+    line = ":".join([opcode] + arguments)
+
+    if(verify > 0):
+        checksum = 0
+        for char in line:
+            checksum += ord(char)
+            checksum &= int("F" * verify, 16)
+        line += "%0*x" % (verify, checksum)
+
+    return(line)
+
+
+#   --------------------------------
+#
+#   synthetic streams
+#
+#   --------------------------------
+
+class synthetic_stream:
+
+    """
+    Reproducible synthetic instruction stream.
+
+    Attributes
+    ----------
+    kinds : str[]
+        Supported stream kinds
+
+    Created by __init__:
+    kind : str
+        One of kinds
+    number_mode : str
+        "hex" or "dec", as in sv_settings.number_mode
+    verify : int
+        Checksum size, as in sv_settings.verify
+    size : int
+        Number of primitives (or log values) per frame
+    random : random.Random
+        Seeded random number generator
+    static : str[]
+        Lines of the static part of "map" frames; None until generated
+    """
+
+    kinds = ["line", "text", "log", "mixed", "map"]
+
+    def __init__(self, kind, number_mode, verify, size=200, seed=0):
+
+        self.kind = kind
+        self.number_mode = number_mode
+        self.verify = verify
+        self.size = size
+        self.random = random.Random(seed)
+        self.static = None
+
+    def point(self):
+        return(
+            encode_float(self.random.uniform(-300, 300), self.number_mode) +
+            "," +
+            encode_float(self.random.uniform(-300, 300), self.number_mode))
+
+    def line(self, opcode, arguments):
+        return(encode_line(opcode, arguments, self.verify))
+
+    def line_frame(self, count):
+        return([
+            self.line("drawline", [self.point(), self.point(), "black"])
+            for i in range(count)])
+
+    def text_frame(self, count):
+        return([
+            self.line("text", [
+                "label" + str(i), self.point(),
+                encode_int(12, self.number_mode), "black"])
+            for i in range(count)])
+
+    def log_frame(self, count):
+        # channel values are logged as one block, state on its own
+        lines = [self.line("logstart", [])]
+        for i in range(count):
+            lines.append(self.line("logf", [
+                "ch" + str(i),
+                encode_float(self.random.gauss(0, 1), self.number_mode)]))
+        lines.append(self.line("logend", []))
+        lines.append(self.line("logs", ["state", "running"]))
+        return(lines)
+
+    def map_frame(self, count):
+        # the same map every frame, with a moving robot drawn over it
+        if(self.static is None):
+            self.static = self.line_frame(count)
+        return(self.static + [
+            self.line("drawcircle", [
+                self.point(), encode_float(5, self.number_mode), "red"]),
+            self.line("drawray", [
+                self.point(),
+                encode_float(self.random.uniform(0, 6.28), self.number_mode),
+                encode_float(20, self.number_mode), "red"])])
+
+    def frame(self):
+
+        """
+        Generate the lines of one frame, ending with a draw instruction.
+
+        Returns
+        -------
+        str[]
+            Encoded lines
+        """
+
+        lines = [self.line("definecolor", [
+            "red",
+            ",".join(encode_int(c, self.number_mode) for c in (255, 0, 0))])]
+
+        if(self.kind == "line"):
+            lines += self.line_frame(self.size)
+        elif(self.kind == "text"):
+            lines += self.text_frame(self.size)
+        elif(self.kind == "log"):
+            lines += self.log_frame(self.size)
+        elif(self.kind == "map"):
+            lines += self.map_frame(self.size)
+        else:
+            lines += self.line_frame(self.size // 2)
+            lines += self.text_frame(self.size // 4)
+            lines += self.log_frame(self.size // 4)
+
+        lines.append(self.line("draw", []))
+        return(lines)
+
+    def frames(self, count):
+
+        """
+        Generate count frames.
+
+        Returns
+        -------
+        str[]
+            Encoded lines of every frame
+        """
+
+        lines = []
+        for i in range(count):
+            lines += self.frame()
+        return(lines)
+
+
+#   --------------------------------
+#
+#   transports
+#
+#   --------------------------------
+
+class memory_transport:
+
+    """
+    In-memory stand-in for serial.Serial; replays a list of lines forever.
+
+    Created by __init__:
+    lines : bytes[]
+        Newline-terminated lines to replay
+    index : int
+        Index of the next line
+    bytes_written : int
+        Number of bytes written by the device (confirmations)
+    """
+
+    def __init__(self, lines, encoding="ascii"):
+        self.lines = [(line + "\n").encode(encoding) for line in lines]
+        self.index = 0
+        self.bytes_written = 0
+
+    def readline(self):
+        line = self.lines[self.index]
+        self.index += 1
+        if(self.index == len(self.lines)):
+            self.index = 0
+        return(line)
+
+    def write(self, data):
+        self.bytes_written += len(data)
+
+    def flushInput(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class pty_transport(threading.Thread):
+
+    """
+    Pseudo-terminal transport; writes lines to the master end of a pty, so
+    that serial_vis can open the slave end (path) like a real device.
+
+    Created by __init__:
+    path : str
+        Path of the slave end of the pty
+    """
+
+    def __init__(self, lines, encoding="ascii"):
+
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.data = "".join(line + "\n" for line in lines).encode(encoding)
+        self.master, self.slave = os.openpty()
+        self.path = os.ttyname(self.slave)
+        self.done = False
+
+    def run(self):
+        try:
+            while(not self.done):
+                os.write(self.master, self.data)
+        except OSError:
+            # master closed
+            pass
+
+    def close(self):
+        self.done = True
+        os.close(self.master)
+        os.close(self.slave)
@@ -3,9 +3,11 @@
 __all__ = [
     "buffer",
     "buffer_manager",
+    "trigger",
 ]
 
 # imports for a friendly namespace
 from .buffer import frame_buffer
 from .buffer import buffer_db
 from .buffer_manager import buffer_manager
+from .trigger import trigger_conditions
@@ -1,7 +1,9 @@
 # buffer.py
 # frame buffer storage class
 
+import sys
 import time
+from collections import OrderedDict
 
 
 #   --------------------------------
@@ -23,6 +25,13 @@ class frame_buffer:
         time that the buffer was created
     instructions : instruction[]
         Mixed arrays containing instructions in the buffer.
+    cache : dict
+        Data derived from the instructions by the graphics window (prepared
+        draw calls, etc). Only filled in once the frame is displayed, so that
+        frames which are never shown cost nothing beyond their instructions.
+    stamps : dict
+        Pipeline timestamps of the draw instruction that completed the frame,
+        keyed by stage (see util_lib.latency_stats). Empty if untracked.
     """
 
     #   --------------------------------
@@ -45,6 +54,8 @@ class frame_buffer:
         self.frame_id = -1
         self.timestamp = time.time()
         self.instructions = []
+        self.cache = {}
+        self.stamps = {}
 
         # add frame_id attribute if provided
         if("frame_id" in kwargs):
@@ -69,6 +80,123 @@ class frame_buffer:
         self.instructions += [instruction]
 
 
+#   --------------------------------
+#
+#   Frame delta
+#
+#   --------------------------------
+
+class frame_delta:
+
+    """
+    Frame stored as its changes from the previous frame. Either the frame
+    shares a prefix and a suffix with the previous frame, and only the
+    instructions in between are stored, or (for frames with the same number
+    of instructions) only the instructions that changed are stored, with
+    their positions; whichever stores fewer instructions is used.
+
+    Attributes
+    ----------
+    Created by __init__:
+    frame_id : int
+        Frame ID of the frame
+    timestamp : float
+        time that the frame was created
+    stamps : dict
+        Pipeline timestamps of the frame; shared with every copy of the
+        frame that is rebuilt
+    length : int
+        Number of instructions in the frame
+    prefix : int
+        Number of leading instructions shared with the previous frame
+    suffix : int
+        Number of trailing instructions shared with the previous frame
+    positions : int[] or None
+        Index of each stored instruction, if only changed instructions are
+        stored; None if the instructions between prefix and suffix are
+    instructions : instruction[]
+        Stored instructions
+    """
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, frame, previous):
+
+        """
+        Encode a frame as changes from the previous frame.
+
+        Parameters
+        ----------
+        frame : frame_buffer object
+            Frame to be encoded
+        previous : instruction[]
+            Instructions of the previous frame
+        """
+
+        self.frame_id = frame.frame_id
+        self.timestamp = frame.timestamp
+        self.stamps = frame.stamps
+
+        current = frame.instructions
+        self.length = len(current)
+        self.prefix = shared_prefix(current, previous)
+        self.suffix = shared_suffix(current, previous, self.prefix)
+        self.positions = None
+        self.instructions = current[self.prefix:self.length - self.suffix]
+
+        # same length: store changed instructions only, if there are fewer
+        if(len(previous) == self.length):
+            positions = [
+                i for i in range(self.prefix, self.length - self.suffix)
+                if not same_instruction(current[i], previous[i])]
+            if(len(positions) < len(self.instructions)):
+                self.positions = positions
+                self.instructions = [current[i] for i in positions]
+
+    #   --------------------------------
+    #
+    #   Rebuild frame
+    #
+    #   --------------------------------
+    def apply(self, previous):
+
+        """
+        Rebuild the frame's instructions.
+
+        Parameters
+        ----------
+        previous : instruction[]
+            Instructions of the previous frame
+
+        Returns
+        -------
+        instruction[]
+            Instructions of the frame
+        """
+
+        if(self.positions is None):
+            return(
+                previous[:self.prefix] + self.instructions +
+                previous[len(previous) - self.suffix:])
+
+        instructions = list(previous)
+        for position, instruction in zip(self.positions, self.instructions):
+            instructions[position] = instruction
+        return(instructions)
+
+    def is_keyframe(self):
+
+        """
+        Returns True if the frame shares less than half of its instructions
+        with the previous frame, and should be stored in full instead.
+        """
+
+        return(len(self.instructions) * 2 > self.length)
+
+
 #   --------------------------------
 #
 #   Buffer database
@@ -82,18 +210,34 @@ class buffer_db:
 
     Attributes
     ----------
+    Created by __init__:
+    settings : sv_settings object
+        Settings of the device this database belongs to
     input_buffer : int
         ID of the next buffer to be created
     view_buffer : int
         ID of the buffer that the current view is centered on
+    oldest_buffer : int
+        ID of the oldest buffer that may still be stored
     frame_buffers : dict
-        Frames currently being tracked, keyed by their frame ID
+        Frames currently being tracked, keyed by their frame ID. If
+        settings.delta_history is set, only keyframes (every
+        settings.keyframe_interval frames, or when a frame shares less than
+        half of its instructions with the previous one) are stored as
+        frame_buffer objects; other frames are stored as frame_delta
+        objects from the previous frame.
+        Use get_buffer to get frames.
+    materialized : OrderedDict
+        Frame buffers rebuilt from deltas, keyed by frame ID, least recently
+        used first; at most settings.delta_cache_size are kept. Frames are
+        returned from here while they are kept, so that repeated calls to
+        get_buffer return the same object (and its cache)
+    last_frame : frame_buffer object
+        Most recently stored frame; None if there is none
+    delta_count : int
+        Number of deltas stored since the last keyframe
     """
 
-    input_buffer = 0
-    view_buffer = 0
-    frame_buffers = {}
-
     #   --------------------------------
     #
     #   Initialization
@@ -112,6 +256,17 @@ class buffer_db:
 
         self.settings = settings
 
+        # frame tracking; each device has its own database
+        self.input_buffer = 0
+        self.view_buffer = 0
+        self.oldest_buffer = 0
+        self.frame_buffers = {}
+
+        # delta encoding
+        self.materialized = OrderedDict()
+        self.last_frame = None
+        self.delta_count = 0
+
     #   --------------------------------
     #
     #   Register new buffer
@@ -142,12 +297,16 @@ class buffer_db:
                 frame_buffer.frame_id = self.input_buffer
             # update frame buffers
             self.frame_buffers.update(
-                {self.input_buffer: frame_buffer})
+                {self.input_buffer: self.encode(frame_buffer)})
 
-        # scan for old frame buffers and delete them
-        for element in self.frame_buffers.keys():
-            if(element < self.view_buffer - self.settings.max_size_forward):
-                del self.frame_buffers[element]
+        # delete old frame buffers; IDs are assigned sequentially, so only
+        # the IDs between oldest_buffer and the limit need to be checked
+        while(self.oldest_buffer <
+              self.view_buffer - self.settings.max_size_forward):
+            self.rebase(self.oldest_buffer + 1)
+            self.frame_buffers.pop(self.oldest_buffer, None)
+            self.materialized.pop(self.oldest_buffer, None)
+            self.oldest_buffer += 1
 
         # increment the current input buffer ID
         self.input_buffer += 1
@@ -194,12 +353,144 @@ class buffer_db:
             return(frame_buffer(frame_id=-1))
         else:
             try:
-                return(self.frame_buffers[get_id])
+                return(self.decode(get_id))
             # catch KeyErrors due to jumping to the most recent frame
             # before the frame has been built
             except KeyError:
                 return(frame_buffer(frame_id=-1))
 
+    #   --------------------------------
+    #
+    #   Delta encoding
+    #
+    #   --------------------------------
+    def encode(self, new_frame):
+
+        """
+        Get the history entry of a new frame: a frame_delta from the
+        previously stored frame, or the frame itself if it is a keyframe.
+
+        Parameters
+        ----------
+        new_frame : frame_buffer object
+            Frame to be stored under input_buffer
+
+        Returns
+        -------
+        frame_buffer or frame_delta
+            History entry
+        """
+
+        previous = self.last_frame
+        self.last_frame = new_frame
+
+        # keyframes: delta history disabled, first frame, after a gap, or
+        # every keyframe_interval frames; also frames that mostly changed
+        if(not self.settings.delta_history or previous is None or
+           self.input_buffer - 1 not in self.frame_buffers or
+           self.delta_count >= self.settings.keyframe_interval - 1):
+            self.delta_count = 0
+            return(new_frame)
+
+        delta = frame_delta(new_frame, previous.instructions)
+        if(delta.is_keyframe()):
+            self.delta_count = 0
+            return(new_frame)
+
+        # keep the frame itself, so that it is not rebuilt while it is the
+        # most recent frame
+        self.delta_count += 1
+        self.keep(self.input_buffer, new_frame)
+        return(delta)
+
+    def decode(self, index):
+
+        """
+        Get a stored frame, rebuilding it from the last keyframe if needed.
+
+        Parameters
+        ----------
+        index : int
+            frame ID
+
+        Returns
+        -------
+        frame_buffer
+            Frame buffer
+
+        Raises
+        ------
+        KeyError
+            The frame is not stored
+        """
+
+        entry = self.frame_buffers[index]
+        if(type(entry) != frame_delta):
+            return(entry)
+
+        if(index in self.materialized):
+            self.materialized.move_to_end(index)
+            return(self.materialized[index])
+
+        # find the closest earlier frame with known instructions
+        chain = [entry]
+        base = index - 1
+        while(True):
+            base_entry = self.frame_buffers[base]
+            if(type(base_entry) != frame_delta):
+                instructions = base_entry.instructions
+                break
+            if(base in self.materialized):
+                instructions = self.materialized[base].instructions
+                break
+            chain.append(base_entry)
+            base -= 1
+
+        for delta in reversed(chain):
+            instructions = delta.apply(instructions)
+
+        rebuilt = frame_buffer(frame_id=entry.frame_id)
+        rebuilt.timestamp = entry.timestamp
+        rebuilt.stamps = entry.stamps
+        rebuilt.instructions = instructions
+
+        self.keep(index, rebuilt)
+        return(rebuilt)
+
+    def keep(self, index, rebuilt):
+
+        """
+        Add a frame to the materialized frame cache, discarding the least
+        recently used frames if the cache is full.
+
+        Parameters
+        ----------
+        index : int
+            frame ID
+        rebuilt : frame_buffer object
+            Frame buffer
+        """
+
+        self.materialized[index] = rebuilt
+        self.materialized.move_to_end(index)
+        while(len(self.materialized) > max(self.settings.delta_cache_size, 1)):
+            self.materialized.popitem(last=False)
+
+    def rebase(self, index):
+
+        """
+        Store a frame as a keyframe if it is a delta, so that the frame
+        before it can be deleted.
+
+        Parameters
+        ----------
+        index : int
+            frame ID
+        """
+
+        if(type(self.frame_buffers.get(index)) == frame_delta):
+            self.frame_buffers[index] = self.decode(index)
+
     #   --------------------------------
     #
     #   Set current view
@@ -244,3 +535,86 @@ class buffer_db:
         # self.input_buffer is the next key to be created
         # not the most recently created key
         return((self.view_buffer, self.input_buffer - 1))
+
+    #   --------------------------------
+    #
+    #   Estimate memory usage
+    #
+    #   --------------------------------
+    def memory_usage(self):
+
+        """
+        Estimate the memory used by the stored frames. To keep this cheap,
+        only the first few instructions of each frame are measured, and the
+        rest are assumed to be the same size.
+
+        Returns
+        -------
+        int
+            Estimated size in bytes
+        """
+
+        total = 0
+        for stored_frame in list(self.frame_buffers.values()):
+            # deltas only hold their changed instructions
+            instructions = stored_frame.instructions
+            total += sys.getsizeof(instructions)
+
+            sample = instructions[:8]
+            if(len(sample) > 0):
+                sample_size = 0
+                for instruction in sample:
+                    sample_size += sys.getsizeof(instruction)
+                    for argument in instruction:
+                        sample_size += sys.getsizeof(argument)
+                total += sample_size * len(instructions) // len(sample)
+
+        # rebuilt frames share their instructions with the stored frames
+        for rebuilt in list(self.materialized.values()):
+            total += sys.getsizeof(rebuilt.instructions)
+
+        return(total)
+
+
+#   --------------------------------
+#
+#   Instruction comparison
+#
+#   --------------------------------
+def same_instruction(first, second):
+
+    """
+    Check whether two instructions are identical; instructions shared
+    between frames are compared by identity first.
+    """
+
+    return(first is second or first == second)
+
+
+def shared_prefix(current, previous):
+
+    """
+    Get the number of leading instructions that two instruction lists have
+    in common.
+    """
+
+    limit = min(len(current), len(previous))
+    count = 0
+    while(count < limit and same_instruction(current[count], previous[count])):
+        count += 1
+    return(count)
+
+
+def shared_suffix(current, previous, prefix):
+
+    """
+    Get the number of trailing instructions that two instruction lists have
+    in common, not counting the first prefix instructions of either.
+    """
+
+    limit = min(len(current), len(previous)) - prefix
+    count = 0
+    while(count < limit and
+          same_instruction(current[-1 - count], previous[-1 - count])):
+        count += 1
+    return(count)
@@ -1,6 +1,9 @@
 # buffer_io.py
 # buffer read and write to file functions
 
+import queue
+import threading
+
 
 #   --------------------------------
 #
@@ -65,6 +68,53 @@ def save(index, file, buffer_db, mode):
     return(status)
 
 
+#   --------------------------------
+#
+#   Save a list of buffers
+#
+#   --------------------------------
+def save_frames(frames, file, mode):
+
+    """
+    Save a list of buffers to file; used to save buffers that have been
+    taken out of their buffer_db.
+
+    parameters
+    ----------
+    frames : frame_buffer[]
+        buffers to write
+    file : str
+        filename to write to
+    mode : str
+        "a" or "w", to append or overwrite
+
+    returns
+    -------
+    str
+        error code; empty if success
+    """
+
+    if(mode not in ('a', 'w')):
+        return("stx")
+
+    try:
+        savefile = open(file, mode)
+    except IOError:
+        return("ioe")
+    except Exception as e:
+        return(str(e))
+
+    status = ""
+    for out_buffer in frames:
+        restatus = save_buffer(savefile, out_buffer)
+        if(restatus != ""):
+            status = restatus
+
+    savefile.close()
+
+    return(status)
+
+
 #   --------------------------------
 #
 #   Save buffer
@@ -107,6 +157,75 @@ def save_buffer(file, out_buffer):
         return("")
 
 
+#   --------------------------------
+#
+#   Background save thread
+#
+#   --------------------------------
+class save_thread(threading.Thread):
+
+    """
+    Writes lists of buffers with save_frames in the background, so that
+    saving doesn't hold up the caller.
+
+    Attributes
+    ----------
+    Created by __init__:
+    report : function
+        Called with the error code of each save; empty if success
+    jobs : queue.Queue
+        (frames, file, mode) saves waiting to be written; None marks the
+        end
+    """
+
+    def __init__(self, report):
+
+        """
+        Create and start a save thread.
+
+        parameters
+        ----------
+        report : function
+            Called with the error code of each save
+        """
+
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.report = report
+        self.jobs = queue.Queue()
+        self.start()
+
+    def save(self, frames, file, mode):
+
+        """
+        Queue a list of buffers to be saved; see save_frames.
+        """
+
+        self.jobs.put((frames, file, mode))
+
+    def close(self):
+
+        """
+        Finish the queued saves, and stop the thread.
+        """
+
+        self.jobs.put(None)
+        self.join()
+
+    def run(self):
+
+        """
+        Write saves until the end marker is received.
+        """
+
+        while(True):
+            job = self.jobs.get()
+            if(job is None):
+                break
+            self.report(save_frames(*job))
+
+
 #   --------------------------------
 #
 #   Load buffers
@@ -1,8 +1,12 @@
 # buffer_manager.py
 # serial_vis specific buffer management
 
+import os
+import time
 from .buffer import *
+from .trigger import *
 from . import buffer_io
+from ..serial_lib.opcode_registry import *
 
 
 #   --------------------------------
@@ -17,16 +21,33 @@ class buffer_manager:
 
     Attributes
     ----------
-    is_live : bool
-        Is the current display buffer live?
-    display_buffer_id : int
+    Created by __init__:
+    buffer_db : dict
+        Frame buffer database of each device, keyed by device name
+    current_buffer : dict
+        Frame being built from each device's instructions, keyed by device
+        name
+    is_live : dict
+        Is each device's display buffer live? Keyed by device name
+    display_buffer_id : dict
         id of currently displayed buffer, relative to the current center buffer
-        (most recent, or where the stream was paused)
+        (most recent, or where the stream was paused), keyed by device name
+    triggers : dict
+        Compiled trigger conditions of each device, keyed by device name
+    captures : dict
+        Trigger capture in progress for each device, keyed by device name;
+        None if the device is armed. Captures are dicts with the "first",
+        "trigger" and "last" frame IDs of the capture window.
+    capture_count : dict
+        Number of captures completed by each device, keyed by device name
+    save_thread : buffer_io.save_thread
+        Background writer for capture saves; None until the first capture
+        is saved
+    controls : dict
+        Handler for each control opcode, keyed by opcode ID; instructions
+        with other opcodes are added to the current frame
     """
 
-    is_live = True
-    display_buffer_id = {"main": 0}
-
     #   --------------------------------
     #
     #   Initialization
@@ -48,21 +69,77 @@ class buffer_manager:
         # set up settings
         self.settings = settings
 
-        # set up buffer db
-        self.buffer_db = {"main": buffer_db(self.settings["main"])}
-
         # set up error handler
         self.error_handler = error_handler
 
-        # set up initial frame buffer
-        self.current_buffer = frame_buffer()
+        # per-device buffer db, frame being built, and view state
+        self.buffer_db = {}
+        self.current_buffer = {}
+        self.is_live = {}
+        self.display_buffer_id = {}
+        self.triggers = {}
+        self.captures = {}
+        self.capture_count = {}
+        self.save_thread = None
+        self.add_target("main")
+
+        # control instruction handlers
+        self.controls = {
+            DRAW: self.end_frame,
+            TRIGGER: self.trigger}
+
+    #   --------------------------------
+    #
+    #   Register new device
+    #
+    #   --------------------------------
+    def add_target(self, target):
+
+        """
+        Create the buffer db, frame buffer, view state and trigger state of
+        a new device.
+
+        Parameters
+        ----------
+        target : str
+            name of the device
+        """
+
+        self.buffer_db[target] = buffer_db(self.settings[target])
+        self.current_buffer[target] = frame_buffer()
+        self.is_live[target] = True
+        self.display_buffer_id[target] = 0
+        self.triggers[target] = trigger_conditions(
+            self.settings[target].trigger_conditions, self.error_handler)
+        self.captures[target] = None
+        self.capture_count[target] = 0
+
+    def get_triggers(self, target):
+
+        """
+        Get the trigger conditions of a device, registering it if needed.
+
+        Parameters
+        ----------
+        target : str
+            name of the device
+
+        Returns
+        -------
+        trigger_conditions object
+            Compiled trigger conditions
+        """
+
+        if target not in self.buffer_db:
+            self.add_target(target)
+        return(self.triggers[target])
 
     #   --------------------------------
     #
     #   Update current buffer
     #
     #   --------------------------------
-    def update(self, target, instruction):
+    def update(self, target, instruction, stamp=None, dequeue_time=0):
 
         """
         Update the current buffer.
@@ -73,37 +150,165 @@ class buffer_manager:
             string naming the target buffer db
         instruction : array
             array containing the instruction to be processed
+        stamp : float[3] or None
+            (read, parse, enqueue) times of the instruction, if tracked
+        dequeue_time : float
+            time that the instruction was removed from the device queue
+
+        Returns
+        -------
+        frame_buffer or None
+            The frame buffer completed by this instruction, if any
         """
 
         # check for new target
         if target not in self.buffer_db:
-            self.buffer_db.update({target: buffer_db(self.settings[target])})
-            self.display_buffer_id.update({target: 0})
+            self.add_target(target)
 
         # check for control instructions:
-        if(instruction[0] == "draw" and self.settings["main"].enable_graphics):
-
-            # live => create new buffer
-            # set the current view
-            if(self.is_live):
-                self.buffer_db[target].new_buffer(self.current_buffer)
-                self.buffer_db[target].set_current_view()
-            # not live => create new buffer
-            # do not set current view
-            else:
-                self.buffer_db[target].new_buffer(self.current_buffer)
-
-            # create new frame buffer
-            self.current_buffer = frame_buffer()
-
-        # trigger instruction
-        elif(instruction[0] == "trigger"):
-            self.is_live = False
-            self.display_buffer_id.update({target: 0})
-
-        # otherwise, add it to current buffer
+        control = self.controls.get(registry.get_opid(instruction))
+        if(control is not None):
+            return(control(target, instruction, stamp, dequeue_time))
+
+        # otherwise, add it to the device's current buffer
+        self.current_buffer[target].add_instruction(instruction)
+        return(None)
+
+    #   --------------------------------
+    #
+    #   Control instructions
+    #
+    #   --------------------------------
+    def end_frame(self, target, instruction, stamp, dequeue_time):
+
+        """
+        Handle a draw instruction: store the current frame, and start a new
+        one. Parameters and return value as in update.
+        """
+
+        # draw instructions are stored as-is if graphics are disabled
+        current_buffer = self.current_buffer[target]
+        if(not self.settings["main"].enable_graphics):
+            current_buffer.add_instruction(instruction)
+            return(None)
+
+        # record pipeline timestamps
+        if(stamp is not None):
+            current_buffer.stamps = {
+                "read": stamp[0],
+                "parse": stamp[1],
+                "enqueue": stamp[2],
+                "dequeue": dequeue_time,
+                "commit": time.time()}
+
+        # live => create new buffer
+        # set the current view
+        if(self.is_live[target]):
+            self.buffer_db[target].new_buffer(current_buffer)
+            self.buffer_db[target].set_current_view()
+        # not live => create new buffer
+        # do not set current view
         else:
-            self.current_buffer.add_instruction(instruction)
+            self.buffer_db[target].new_buffer(current_buffer)
+
+        # create new frame buffer
+        self.current_buffer[target] = frame_buffer()
+
+        # finish the capture once its last frame is stored
+        capture = self.captures[target]
+        if(capture is not None and
+           self.buffer_db[target].input_buffer > capture["last"]):
+            self.end_capture(target)
+
+        return(current_buffer)
+
+    def trigger(self, target, instruction, stamp, dequeue_time):
+
+        """
+        Handle a trigger instruction: start a capture on the device. Other
+        devices are unaffected. Parameters and return value as in update.
+        """
+
+        self.start_capture(target)
+        return(None)
+
+    #   --------------------------------
+    #
+    #   Trigger capture
+    #
+    #   --------------------------------
+    def start_capture(self, target):
+
+        """
+        Start a capture window around the frame currently being built:
+        settings.trigger_pre_frames frames before it, and
+        settings.trigger_post_frames frames after it. Triggers are ignored
+        while a capture is in progress, and, if settings.trigger_pause is
+        set, while the device is paused; resuming live mode re-arms it.
+
+        Parameters
+        ----------
+        target : str
+            name of the device that triggered
+        """
+
+        if target not in self.buffer_db:
+            self.add_target(target)
+        if(self.captures[target] is not None):
+            return
+        if(self.settings[target].trigger_pause and not self.is_live[target]):
+            return
+
+        trigger_frame = self.buffer_db[target].input_buffer
+        self.captures[target] = {
+            "first": max(
+                trigger_frame - self.settings[target].trigger_pre_frames, 0),
+            "trigger": trigger_frame,
+            "last": trigger_frame + self.settings[target].trigger_post_frames}
+
+    def end_capture(self, target):
+
+        """
+        Finish a device's capture: save the capture window with buffer_io
+        (unless settings.trigger_save_name is blank), and pause the device
+        at the trigger frame if settings.trigger_pause is set. The frames
+        are taken from the buffer_db here, and written to file by
+        save_thread, so that the file isn't written under the ingest lock.
+
+        Parameters
+        ----------
+        target : str
+            name of the device
+        """
+
+        capture = self.captures[target]
+        self.captures[target] = None
+        self.capture_count[target] += 1
+
+        settings = self.settings[target]
+        db = self.buffer_db[target]
+
+        # save the frames of the window that are still stored
+        if(settings.trigger_save_name != ""):
+            name, extension = os.path.splitext(settings.trigger_save_name)
+            frames = [
+                db.get_buffer(i) for i in range(
+                    max(capture["first"], db.oldest_buffer),
+                    min(capture["last"] + 1, db.input_buffer))]
+
+            if(self.save_thread is None):
+                self.save_thread = buffer_io.save_thread(self.save_status)
+            self.save_thread.save(
+                frames,
+                name + "_" + target + "_" +
+                str(self.capture_count[target]) + extension,
+                "w")
+
+        # single shot: stop at the trigger frame
+        if(settings.trigger_pause):
+            self.is_live[target] = False
+            db.set_current_view(absolute=capture["trigger"])
+            self.display_buffer_id[target] = 0
 
     #   --------------------------------
     #
@@ -124,8 +329,6 @@ class buffer_manager:
         # return null buffer if the target device does not exist yet
         if target not in self.buffer_db:
             return(frame_buffer(frame_id=-1))
-        if target not in self.display_buffer_id:
-            return(frame_buffer(frame_id=-1))
         # get target device buffer
         return(
             self.buffer_db[target].get_buffer(
@@ -139,22 +342,29 @@ class buffer_manager:
     def change_buffer(self, index, target):
 
         """
-        Change the current buffer.
+        Change the current buffer of a device; other devices keep their
+        view.
 
         parameters
         ----------
         index : int
             relative change in index. If index=0, toggle live mode.
+        target : str
+            name of the device
         """
 
+        # devices can be paused before their first instruction
+        if target not in self.buffer_db:
+            self.add_target(target)
+
         if(index == 0):
-            self.is_live = not self.is_live
-            if(self.is_live):
+            self.is_live[target] = not self.is_live[target]
+            if(self.is_live[target]):
                 self.display_buffer_id[target] = 0
 
         else:
             # can only change buffer when not live
-            if not self.is_live:
+            if not self.is_live[target]:
                 self.display_buffer_id[target] += index
 
             # check for out of bounds
@@ -176,12 +386,40 @@ class buffer_manager:
                 self.display_buffer_id[target] = (
                     -self.buffer_db[target].view_buffer)
 
+    #   --------------------------------
+    #
+    #   Get history information
+    #
+    #   --------------------------------
+    def get_history_info(self, target):
+
+        """
+        Get the number of stored frames and their estimated memory usage.
+
+        Parameters
+        ----------
+        target : str
+            name of the target buffer db
+
+        Returns
+        -------
+        int[]
+            (frame count, estimated bytes)
+        """
+
+        if target not in self.buffer_db:
+            return((0, 0))
+
+        return((
+            len(self.buffer_db[target].frame_buffers),
+            self.buffer_db[target].memory_usage()))
+
     #   --------------------------------
     #
     #   Save a selection of buffers
     #
     #   --------------------------------
-    def save(self, index, filename, mode):
+    def save(self, index, filename, mode, target="main"):
 
         """
         Save a selection of buffers
@@ -194,14 +432,42 @@ class buffer_manager:
             filename to open and write to
         mode : str
             "a" or "w", to append or overwrite
+        target : str
+            name of the device to save buffers from
         """
 
         # direct passthrough to buffer_io
-        status = buffer_io.save(index, filename, self.buffer_db["main"], mode)
+        self.save_status(
+            buffer_io.save(index, filename, self.buffer_db[target], mode))
+
+    def save_status(self, status):
+
+        """
+        Raise the error returned by a buffer_io save, if any.
+
+        parameters
+        ----------
+        status : str
+            error code; empty if success
+        """
 
-        # raise error if failed
         if(status in ("ioe", "stx", "nub")):
             self.error_handler.raise_error(status, [], "")
 
         elif(status != ""):
             self.error_handler.raise_error("unk", [], "")
+
+    #   --------------------------------
+    #
+    #   Clean exit
+    #
+    #   --------------------------------
+    def close(self):
+
+        """
+        Finish writing queued capture saves.
+        """
+
+        if(self.save_thread is not None):
+            self.save_thread.close()
+            self.save_thread = None
@@ -0,0 +1,188 @@
+# trigger.py
+# trigger conditions, compiled into per-opcode checks
+
+import operator
+from ..serial_lib.opcode_registry import *
+
+
+#   --------------------------------
+#
+#   Trigger conditions
+#
+#   --------------------------------
+
+class trigger_conditions:
+
+    """
+    Trigger conditions of a device, compiled from settings.trigger_conditions
+    into a table of checks keyed by opcode ID, so that instructions with
+    opcodes that have no condition cost a single dictionary lookup.
+
+    Each condition is one of:
+    "<opcode>" : fires on any instruction with that opcode
+    ("logf", label, comparison, threshold) : fires when a logf value for
+        the label compares true against the threshold; comparison is one
+        of <, <=, >, >=, ==, !=
+    ("predicate", "<opcode>", function) : fires when function(instruction)
+        returns True for an instruction with that opcode
+    function : fires when function(instruction) returns True; called for
+        every instruction
+
+    Attributes
+    ----------
+    comparisons : dict
+        Comparison function for each comparison string
+
+    Created by __init__:
+    checks : dict
+        Checks for each opcode, keyed by opcode ID; each check is a
+        function taking the instruction and returning True to fire
+    any_checks : array
+        Checks called for every instruction
+    """
+
+    comparisons = {
+        "<": operator.lt,
+        "<=": operator.le,
+        ">": operator.gt,
+        ">=": operator.ge,
+        "==": operator.eq,
+        "!=": operator.ne,
+    }
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, conditions, error_handler):
+
+        """
+        Compile trigger conditions.
+
+        Parameters
+        ----------
+        conditions : array
+            Trigger conditions, as described above
+        error_handler : error_handler object
+            Centralized error handling; invalid conditions raise "stx" and
+            are skipped
+        """
+
+        self.checks = {}
+        self.any_checks = []
+
+        for condition in conditions:
+            try:
+                self.compile(condition)
+            except (TypeError, ValueError, KeyError, IndexError):
+                error_handler.raise_error(
+                    "stx", [], "trigger condition " + str(condition))
+
+    #   --------------------------------
+    #
+    #   Compile a condition
+    #
+    #   --------------------------------
+    def compile(self, condition):
+
+        """
+        Compile a condition, and add it to the check tables.
+
+        Parameters
+        ----------
+        condition : str, tuple or function
+            Trigger condition
+        """
+
+        if(callable(condition)):
+            self.any_checks.append(condition)
+
+        elif(type(condition) == str):
+            self.add_check(condition, fire)
+
+        elif(condition[0] == "logf"):
+            label = condition[1]
+            compare = self.comparisons[condition[2]]
+            threshold = float(condition[3])
+
+            def check(instruction):
+                return(
+                    instruction[1] == label and
+                    compare(instruction[2], threshold))
+
+            self.add_check("logf", check)
+
+        elif(condition[0] == "predicate" and callable(condition[2])):
+            self.add_check(condition[1], condition[2])
+
+        else:
+            raise ValueError(condition)
+
+    def add_check(self, opcode, check):
+
+        """
+        Add a check for an opcode.
+
+        Parameters
+        ----------
+        opcode : str
+            Opcode name; registered if needed
+        check : function
+            Function taking the instruction, and returning True to fire
+        """
+
+        opid = registry.register(opcode)
+        try:
+            self.checks[opid].append(check)
+        except KeyError:
+            self.checks[opid] = [check]
+
+    #   --------------------------------
+    #
+    #   Evaluate conditions
+    #
+    #   --------------------------------
+    def test(self, instruction, opid):
+
+        """
+        Check whether an instruction fires the trigger.
+
+        Parameters
+        ----------
+        instruction : array
+            Parsed instruction
+        opid : int
+            Opcode ID of the instruction
+
+        Returns
+        -------
+        bool
+            True if any condition fired
+        """
+
+        for check in self.checks.get(opid, ()):
+            if(check(instruction)):
+                return(True)
+        for check in self.any_checks:
+            if(check(instruction)):
+                return(True)
+        return(False)
+
+    def is_empty(self):
+
+        """
+        Returns True if there are no conditions, so that test is never
+        needed.
+        """
+
+        return(len(self.checks) == 0 and len(self.any_checks) == 0)
+
+
+#   --------------------------------
+#
+#   Opcode condition check
+#
+#   --------------------------------
+def fire(instruction):
+    return(True)
@@ -3,10 +3,16 @@
 __all__ = [
     "default_vector_graphics",
     "vector_graphics_window",
-    "command_line"
+    "command_line",
+    "plot_buffer",
+    "decimate_columns",
+    "spatial_grid"
 ]
 
 # imports for a friendly namespace
 from .default_vector_graphics import default_vector_graphics
 from .vector_graphics_window import vector_graphics_window
 from .command_line import command_line
+from .plot_buffer import plot_buffer
+from .decimate import decimate_columns
+from .spatial_grid import spatial_grid
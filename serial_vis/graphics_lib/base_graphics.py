@@ -3,6 +3,9 @@
 
 import pygame
 import time
+from ..util_lib.latency_stats import latency_stats
+from ..util_lib.rate_estimator import rate_estimator
+from ..serial_lib.opcode_registry import *
 
 
 #   --------------------------------
@@ -18,10 +21,16 @@ class base_graphics:
 
     Attributes
     ----------
-    frame_times : float[]
-        log of the past settings.fps_smooth_size frames.
-
     Created by __init__:
+    frame_times : dict
+        rate_estimator over the past settings.fps_smooth_size frames of each
+        device, keyed by device name
+    drag_position : int[] or None
+        Last mouse position of a drag in progress; None if not dragging
+    latency : dict
+        latency_stats object for each device, keyed by device name
+    fonts : dict
+        Fonts created by get_font, keyed by (name, size)
     screen : pygame.display
         main pygame display
     clock : pygame.clock
@@ -30,8 +39,6 @@ class base_graphics:
         error handler class
     """
 
-    frame_times = {}
-
     #   --------------------------------
     #
     #   Initialization
@@ -61,6 +68,13 @@ class base_graphics:
 
         self.error_handler = error_handler
 
+        self.latency = {}
+        self.frame_times = {}
+
+        self.drag_position = None
+
+        self.fonts = {}
+
     #   --------------------------------
     #
     #   Check events; return list of events
@@ -78,6 +92,7 @@ class base_graphics:
         """
 
         triggered_events = []
+        pan = [0, 0]
         for current_event in pygame.event.get():
             if(current_event.type == pygame.KEYDOWN and
                current_event.key in self.settings["main"].events):
@@ -86,9 +101,86 @@ class base_graphics:
             if(current_event.type == pygame.QUIT):
                 triggered_events.append(
                     self.settings["main"].events[pygame.QUIT])
+            if(self.settings["main"].mouse_view):
+                self.check_mouse_event(current_event, triggered_events, pan)
+
+        # motion is merged into a single pan per update
+        if(pan != [0, 0]):
+            triggered_events.append(("pan", pan[0], pan[1]))
 
         return(triggered_events)
 
+    def check_mouse_event(self, current_event, triggered_events, pan):
+
+        """
+        Convert a mouse event into view events. The wheel zooms about the
+        cursor, dragging with the left button pans, and the middle button
+        resets the view.
+
+        Parameters
+        ----------
+        current_event : pygame.event.Event
+            Event to check
+        triggered_events : array
+            List of triggered events; zoom and reset events are appended
+        pan : int[2]
+            Accumulated drag motion; updated in place
+        """
+
+        if(current_event.type == pygame.MOUSEBUTTONDOWN):
+            # wheel up / down
+            if(current_event.button in (4, 5)):
+                step = self.settings["main"].zoom_step
+                triggered_events.append((
+                    "zoom",
+                    step if current_event.button == 4 else 1 / step,
+                    current_event.pos[0],
+                    current_event.pos[1]))
+            elif(current_event.button == 1):
+                self.drag_position = current_event.pos
+            elif(current_event.button == 2):
+                triggered_events.append(("resetview",))
+
+        elif(current_event.type == pygame.MOUSEBUTTONUP and
+             current_event.button == 1):
+            self.drag_position = None
+
+        elif(current_event.type == pygame.MOUSEMOTION and
+             self.drag_position is not None):
+            pan[0] += current_event.pos[0] - self.drag_position[0]
+            pan[1] += current_event.pos[1] - self.drag_position[1]
+            self.drag_position = current_event.pos
+
+    #   --------------------------------
+    #
+    #   Get font
+    #
+    #   --------------------------------
+    def get_font(self, name, size):
+
+        """
+        Get a system font; fonts are created once and cached.
+
+        Parameters
+        ----------
+        name : str
+            Font name
+        size : int
+            Font size
+
+        Returns
+        -------
+        pygame.font.Font
+            Font object
+        """
+
+        try:
+            return(self.fonts[(name, size)])
+        except KeyError:
+            font = pygame.font.SysFont(name, size)
+            self.fonts[(name, size)] = font
+            return(font)
+
     #   --------------------------------
     #
     #   Close window
@@ -108,27 +200,36 @@ class base_graphics:
     #   Check for update to fps registry
     #
     #   --------------------------------
-    def update_fps(self, instruction, device_name):
+    def update_fps(self, instruction, device_name, event_time=None):
 
         """
-        Check whether the instruction triggers an fps update.
+        Check whether the instruction triggers an fps update. Callers with
+        many instructions should only pass instructions whose opcode is
+        settings.fps_count_keyword.
 
         Parameters
         ----------
         instruction: array following instruction form
             instruction to be checked
+        device_name : str
+            device the instruction came from
+        event_time : float
+            time of the instruction, as time.time(); defaults to now
         """
 
+        if(registry.get_opid(instruction) != registry.register(
+                self.settings[device_name].fps_count_keyword)):
+            return
+
         # initialize frame times for new device
         if device_name not in self.frame_times:
-            self.frame_times.update({device_name: []})
+            self.frame_times.update({device_name: rate_estimator(
+                self.settings[device_name].fps_smooth_size)})
 
         # update frame times
-        if(instruction[0] == self.settings[device_name].fps_count_keyword):
-            self.frame_times[device_name].append(time.time())
-            if(len(self.frame_times[device_name]) >
-               self.settings[device_name].fps_smooth_size):
-                del self.frame_times[device_name][0]
+        if(event_time is None):
+            event_time = time.time()
+        self.frame_times[device_name].add(event_time)
 
     #   --------------------------------
     #
@@ -144,14 +245,78 @@ class base_graphics:
         Returns
         -------
         float
-            fps, smoothed over settings.frame_smooth_size frames
+            fps, smoothed over settings.fps_smooth_size frames
         """
 
         if(device not in self.frame_times):
             return(0)
 
-        elif(len(self.frame_times[device]) < 2):
-            return(0)
+        return(self.frame_times[device].rate())
+
+    def compute_jitter(self, device):
+
+        """
+        Returns frame interval statistics.
+
+        Returns
+        -------
+        (float, float, float)
+            Mean, standard deviation and maximum of the interval between
+            frames (seconds), over settings.fps_smooth_size frames
+        """
+
+        if(device not in self.frame_times):
+            return((0, 0, 0))
+
+        return(self.frame_times[device].jitter())
+
+    #   --------------------------------
+    #
+    #   Record frame latency
+    #
+    #   --------------------------------
+    def update_latency(self, frame_buffer, device_name):
+
+        """
+        Mark a frame as displayed, and record its pipeline latency the first
+        time it is shown.
+
+        Parameters
+        ----------
+        frame_buffer : frame_buffer object
+            Frame that was just displayed
+        device_name : str
+            Device the frame belongs to
+        """
+
+        # untracked, or already recorded
+        if(not frame_buffer.stamps or "display" in frame_buffer.stamps):
+            return
+
+        frame_buffer.stamps["display"] = time.time()
+
+        if device_name not in self.latency:
+            self.latency.update({device_name: latency_stats(
+                self.settings[device_name].latency_window)})
+        self.latency[device_name].add(frame_buffer.stamps)
+
+    #   --------------------------------
+    #
+    #   Compute latency percentiles
+    #
+    #   --------------------------------
+    def compute_latency(self, device):
+
+        """
+        Returns latency statistics for a device.
+
+        Returns
+        -------
+        dict
+            (p50, p99) in seconds for each pipeline stage
+        """
+
+        if(device not in self.latency):
+            return({})
 
-        return(len(self.frame_times[device]) /
-               (self.frame_times[device][-1] - self.frame_times[device][0]))
+        return(self.latency[device].summary())
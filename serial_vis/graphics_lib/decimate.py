@@ -0,0 +1,60 @@
+# decimate.py
+# level of detail reduction for dense polylines
+
+
+#   --------------------------------
+#
+#   per pixel column decimation
+#
+#   --------------------------------
+
+def decimate_columns(points):
+
+    """
+    Reduce a polyline in screen coordinates so that each run of consecutive
+    points in the same pixel column keeps at most four points: the first,
+    the minimum, the maximum and the last, in their original order. The
+    rasterized line is unchanged, and the number of points is bounded by
+    the number of columns crossed rather than the number of points.
+
+    Parameters
+    ----------
+    points : int[][]
+        (x, y) screen coordinates of the polyline
+
+    Returns
+    -------
+    int[][]
+        (x, y) coordinates of the reduced polyline
+    """
+
+    reduced = []
+
+    start = 0
+    while(start < len(points)):
+
+        # find the run of points in this column
+        column = points[start][0]
+        end = start + 1
+        while(end < len(points) and points[end][0] == column):
+            end += 1
+
+        if(end - start <= 4):
+            reduced += points[start:end]
+
+        else:
+            low = start
+            high = start
+            for i in range(start + 1, end):
+                if(points[i][1] < points[low][1]):
+                    low = i
+                if(points[i][1] > points[high][1]):
+                    high = i
+
+            # keep the original order, without repeating points
+            keep = sorted(set([start, low, high, end - 1]))
+            reduced += [points[i] for i in keep]
+
+        start = end
+
+    return(reduced)
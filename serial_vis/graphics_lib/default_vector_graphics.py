@@ -4,6 +4,8 @@
 
 import math
 from .vector_graphics_window import *
+from .decimate import *
+from .spatial_grid import *
 
 
 #   --------------------------------
@@ -19,9 +21,43 @@ class default_vector_graphics(vector_graphics_window):
 
     Attributes
     ----------
-    All attributes inherited from vector_graphics_window
+    transform_ops : str[]
+        Opcodes that change the transform; frames are split into cullable
+        segments at these instructions
+    state_ops : str[]
+        Opcodes that change the drawing state
+    timed_names : dict
+        Merged drawline runs are timed as drawline; the culling query of
+        drawsegment calls is timed as culling
+    All other attributes inherited from vector_graphics_window
     """
 
+    transform_ops = ["setscale", "setoffset"]
+    state_ops = ["definecolor", "setscale", "setoffset"]
+    timed_names = {"drawpolyline": "drawline", "drawsegment": "culling"}
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, settings, error_handler):
+
+        """
+        Create a default vector graphics window.
+
+        Parameters
+        ----------
+        settings: sv_settings object
+            object containing settings to be used
+        error_handler: error_handler object
+            object containing error handling methods
+        """
+
+        vector_graphics_window.__init__(self, settings, error_handler)
+
+        self.cache_stats["polyline"] = [0, 0]
+
     #   --------------------------------
     #
     #   utility functions
@@ -30,7 +66,8 @@ class default_vector_graphics(vector_graphics_window):
     def transform(self, coord, device):
 
         """
-        Transform a coordinate based on the current scale and offset.
+        Transform a coordinate based on the current scale and offset, then
+        the viewer's zoom and pan (settings.view_zoom, settings.view_pan).
 
         Parameters
         ----------
@@ -44,16 +81,274 @@ class default_vector_graphics(vector_graphics_window):
         int[]
             (x_coord, y_coord), both integers
         """
+
+        zoom = self.settings["main"].view_zoom
+        pan = self.settings["main"].view_pan
         return(
             int(
                 round(
-                    coord[0] * self.settings[device].scale +
-                    self.settings[device].offset[0], 0)),
-            self.settings[device].window_size[1] -
+                    (coord[0] * self.settings[device].scale +
+                     self.settings[device].offset[0]) * zoom + pan[0], 0)),
             int(
                 round(
-                    coord[1] * self.settings[device].scale +
-                    self.settings[device].offset[1], 0)))
+                    (self.settings[device].window_size[1] -
+                     coord[1] * self.settings[device].scale -
+                     self.settings[device].offset[1]) * zoom + pan[1], 0)))
+
+    def inverse_transform(self, coord, device):
+
+        """
+        Transform a screen coordinate back to the current device coordinates.
+
+        Parameters
+        ----------
+        coord : float[]
+            (x_coord, y_coord) on screen
+        device : str
+            name of device to use settings from
+
+        Returns
+        -------
+        float[]
+            (x_coord, y_coord)
+        """
+
+        zoom = self.settings["main"].view_zoom
+        pan = self.settings["main"].view_pan
+        return(
+            ((coord[0] - pan[0]) / zoom - self.settings[device].offset[0]) /
+            self.settings[device].scale,
+            (self.settings[device].window_size[1] -
+             (coord[1] - pan[1]) / zoom -
+             self.settings[device].offset[1]) /
+            self.settings[device].scale)
+
+    def viewport(self, device):
+
+        """
+        Get the visible region in the current device coordinates, padded
+        by the line width.
+
+        Returns
+        -------
+        float[4]
+            (x_min, y_min, x_max, y_max)
+        """
+
+        if(self.settings[device].scale == 0 or
+           self.settings["main"].view_zoom == 0):
+            inf = float("inf")
+            return((-inf, -inf, inf, inf))
+
+        margin = self.settings[device].line_width + 2
+        corners = (
+            self.inverse_transform((-margin, -margin), device),
+            self.inverse_transform(
+                (self.settings[device].window_size[0] + margin,
+                 self.settings[device].window_size[1] + margin),
+                device))
+
+        return(bounds(corners))
+
+    #   --------------------------------
+    #
+    #   merge dense line runs
+    #
+    #   --------------------------------
+    def optimize_ops(self, ops):
+
+        """
+        Merge dense line runs into polylines, then group the result into
+        cullable segments.
+
+        Parameters
+        ----------
+        ops : array
+            List of (draw function, instruction) pairs
+
+        Returns
+        -------
+        array
+            List of (draw function, instruction) pairs
+        """
+
+        return(self.group_segments(self.merge_lines(ops)))
+
+    def merge_lines(self, ops):
+
+        """
+        Merge runs of at least settings.polyline_min_segments connected
+        drawline calls with the same color into a single drawpolyline call.
+
+        Parameters
+        ----------
+        ops : array
+            List of (draw function, instruction) pairs
+
+        Returns
+        -------
+        array
+            List of (draw function, instruction) pairs
+        """
+
+        min_segments = self.settings["main"].polyline_min_segments
+        if(min_segments <= 0):
+            return(ops)
+
+        optimized = []
+        start = 0
+        while(start < len(ops)):
+
+            # find the run of connected lines starting here
+            end = start
+            if(ops[start][1][0] == "drawline"):
+                end = start + 1
+                while(end < len(ops) and
+                      ops[end][1][0] == "drawline" and
+                      ops[end][1][3] == ops[start][1][3] and
+                      ops[end][1][1] == ops[end - 1][1][2]):
+                    end += 1
+
+            if(end - start >= min_segments):
+                points = [ops[start][1][1]]
+                points += [op[1][2] for op in ops[start:end]]
+                optimized.append((
+                    self.drawpolyline,
+                    ["drawpolyline", points, ops[start][1][3], {}]))
+                start = end
+            else:
+                optimized.append(ops[start])
+                start += 1
+
+        return(optimized)
+
+    #   --------------------------------
+    #
+    #   viewport culling
+    #
+    #   --------------------------------
+    def group_segments(self, ops):
+
+        """
+        Group runs of at least settings.cull_min_ops draw calls between
+        transform changes into drawsegment calls, which only draw the
+        primitives intersecting the viewport.
+
+        Parameters
+        ----------
+        ops : array
+            List of (draw function, instruction) pairs
+
+        Returns
+        -------
+        array
+            List of (draw function, instruction) pairs
+        """
+
+        min_ops = self.settings["main"].cull_min_ops
+        if(min_ops <= 0):
+            return(ops)
+
+        grouped = []
+        segment = []
+
+        def end_segment():
+            if(len(segment) >= min_ops):
+                grouped.append((
+                    self.drawsegment, ["drawsegment", list(segment), {}]))
+            else:
+                grouped.extend(segment)
+            del segment[:]
+
+        for op in ops:
+            if(op[1][0] in self.transform_ops):
+                end_segment()
+                grouped.append(op)
+            else:
+                segment.append(op)
+        end_segment()
+
+        return(grouped)
+
+    def visible_ops(self, instruction, device):
+
+        """
+        Get the draw calls of a drawsegment call that intersect the
+        viewport. The spatial index is built the first time the segment is
+        drawn.
+
+        Parameters
+        ----------
+        instruction : array
+            drawsegment instruction
+        device : str
+            Name of the device the instruction belongs to
+
+        Returns
+        -------
+        array
+            List of (draw function, instruction) pairs
+        """
+
+        cache = instruction[2]
+        if("grid" not in cache):
+            cache["grid"] = spatial_grid(
+                [self.get_bbox(op[1]) for op in instruction[1]])
+
+        ops = instruction[1]
+        visible = cache["grid"].query(self.viewport(device))
+        if(visible is not None):
+            ops = [ops[i] for i in visible]
+
+        return(ops)
+
+    def timed_ops(self, instruction, device):
+
+        """
+        Expand drawsegment calls into their visible draw calls.
+        """
+
+        if(instruction[0] == "drawsegment"):
+            return(self.visible_ops(instruction, device))
+        return(None)
+
+    def get_bbox(self, instruction):
+
+        """
+        Get the bounding box of an instruction in device coordinates, using
+        the bbox_<opcode> method for the instruction.
+
+        Returns
+        -------
+        float[4] or None
+            (x_min, y_min, x_max, y_max); None if the instruction has no
+            bounding box method, and should always be drawn
+        """
+
+        try:
+            bbox_function = getattr(self, "bbox_" + instruction[0])
+        except AttributeError:
+            return(None)
+        return(bbox_function(instruction))
+
+    def bbox_drawline(self, instruction):
+        return(bounds(instruction[1:3]))
+
+    def bbox_drawpolyline(self, instruction):
+        return(bounds(instruction[1]))
+
+    def bbox_drawcircle(self, instruction):
+        return((
+            instruction[1][0] - instruction[2],
+            instruction[1][1] - instruction[2],
+            instruction[1][0] + instruction[2],
+            instruction[1][1] + instruction[2]))
+
+    def bbox_drawray(self, instruction):
+        return(bounds((
+            instruction[1],
+            (instruction[1][0] + instruction[3] * math.cos(instruction[2]),
+             instruction[1][1] + instruction[3] * math.sin(instruction[2])))))
 
     #   --------------------------------
     #
@@ -69,8 +364,12 @@ class default_vector_graphics(vector_graphics_window):
 
     def definecolor(self, instruction, device):
         if(len(instruction[2]) >= 3):
-            self.settings[device].attr_merge(
-                {"colors": {instruction[1]: instruction[2]}})
+            # only merge actual changes, so that the colors dictionary (and
+            # any layer depending on it) is kept
+            if(self.settings[device].colors.get(instruction[1]) !=
+               instruction[2]):
+                self.settings[device].attr_merge(
+                    {"colors": {instruction[1]: instruction[2]}})
         else:
             self.error_handler.raise_error("tts", instruction[0])
 
@@ -88,6 +387,39 @@ class default_vector_graphics(vector_graphics_window):
             self.transform(instruction[2], device),
             self.settings[device].line_width)
 
+    def drawpolyline(self, instruction, device):
+        # instruction: "drawpolyline", points, color, cache
+        # the decimated screen coordinates are cached until the transform
+        # changes
+        cache = instruction[3]
+        key = (
+            self.settings[device].scale,
+            tuple(self.settings[device].offset),
+            self.settings[device].window_size[1],
+            self.settings["main"].view_zoom,
+            tuple(self.settings["main"].view_pan))
+
+        if(cache.get("key") == key):
+            self.cache_stats["polyline"][0] += 1
+        else:
+            self.cache_stats["polyline"][1] += 1
+            cache["key"] = key
+            cache["points"] = decimate_columns(
+                [self.transform(point, device) for point in instruction[1]])
+
+        pygame.draw.lines(
+            self.screen,
+            self.get_color(instruction[2], device),
+            False,
+            cache["points"],
+            self.settings[device].line_width)
+
+    def drawsegment(self, instruction, device):
+        # instruction: "drawsegment", ops, cache
+        for draw_function, op_instruction in self.visible_ops(
+                instruction, device):
+            draw_function(op_instruction, device)
+
     def drawlinep(self, instruction, device):
         pygame.draw.line(
             self.screen,
@@ -98,7 +430,9 @@ class default_vector_graphics(vector_graphics_window):
 
     def drawcircle(self, instruction, device):
         # width greater than radius protection
-        radius = int(round(instruction[2] * self.settings[device].scale))
+        radius = int(round(
+            instruction[2] * self.settings[device].scale *
+            self.settings["main"].view_zoom))
         if(radius < self.settings[device].line_width):
             radius = self.settings[device].line_width + 1
 
@@ -122,9 +456,8 @@ class default_vector_graphics(vector_graphics_window):
             self.settings[device].line_width)
 
     def text(self, instruction, device):
-        # create font
-        textfont = pygame.font.SysFont(
-            self.settings[device].font, instruction[3])
+        # get font
+        textfont = self.get_font(self.settings[device].font, instruction[3])
         # create surface
         textframe = textfont.render(
             instruction[1], False, self.get_color(instruction[4], device))
@@ -132,10 +465,36 @@ class default_vector_graphics(vector_graphics_window):
         self.screen.blit(textframe, self.transform(instruction[2], device))
 
     def textp(self, instruction, device):
-        # create font
-        textfont = pygame.font.SysFont(self.font, instruction[3])
+        # get font
+        textfont = self.get_font(self.settings[device].font, instruction[3])
         # create surface
         textframe = textfont.render(
             instruction[1], False, self.get_color(instruction[4], device))
         # merge surface
         self.screen.blit(textframe, instruction[2])
+
+
+#   --------------------------------
+#
+#   bounding box of a list of points
+#
+#   --------------------------------
+def bounds(points):
+
+    """
+    Get the bounding box of a list of points.
+
+    Parameters
+    ----------
+    points : float[][]
+        (x, y) points
+
+    Returns
+    -------
+    float[4]
+        (x_min, y_min, x_max, y_max)
+    """
+
+    x_values = [point[0] for point in points]
+    y_values = [point[1] for point in points]
+    return((min(x_values), min(y_values), max(x_values), max(y_values)))
@@ -0,0 +1,148 @@
+# plot_buffer.py
+# ring buffer of recent samples for one plotted label
+
+# numpy is only needed for plotting; serial-vis runs without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+#   --------------------------------
+#
+#   Plot ring buffer
+#
+#   --------------------------------
+
+class plot_buffer:
+
+    """
+    Ring buffer of the most recent samples of a logf label, with decimated
+    min/max envelopes for drawing.
+
+    Attributes
+    ----------
+    enabled : bool
+        False if numpy is not installed
+
+    Created by __init__:
+    values : numpy.ndarray
+        Ring buffer of samples
+    count : int
+        Total number of samples added
+    envelope_cache : tuple
+        (count, width, envelope) of the last computed envelope
+    """
+
+    enabled = numpy is not None
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, size):
+
+        """
+        Create a plot buffer.
+
+        Parameters
+        ----------
+        size : int
+            Number of samples kept
+        """
+
+        self.values = numpy.zeros(size)
+        self.count = 0
+        self.envelope_cache = (-1, 0, None)
+
+    #   --------------------------------
+    #
+    #   Add samples
+    #
+    #   --------------------------------
+    def add_samples(self, samples):
+
+        """
+        Add samples to the ring buffer.
+
+        Parameters
+        ----------
+        samples : float[]
+            New samples, oldest first
+        """
+
+        size = len(self.values)
+        samples = numpy.asarray(samples, dtype=float)[-size:]
+
+        # write in at most two slices, wrapping around the end
+        start = self.count % size
+        split = min(size - start, len(samples))
+        self.values[start:start + split] = samples[:split]
+        self.values[:len(samples) - split] = samples[split:]
+
+        self.count += len(samples)
+
+    #   --------------------------------
+    #
+    #   Get samples in order
+    #
+    #   --------------------------------
+    def get_samples(self):
+
+        """
+        Get the samples in the buffer, oldest first.
+
+        Returns
+        -------
+        numpy.ndarray
+            Samples in the buffer
+        """
+
+        size = len(self.values)
+        if(self.count <= size):
+            return(self.values[:self.count])
+
+        start = self.count % size
+        return(numpy.concatenate((self.values[start:], self.values[:start])))
+
+    #   --------------------------------
+    #
+    #   Min/max envelope
+    #
+    #   --------------------------------
+    def get_envelope(self, width):
+
+        """
+        Decimate the buffer to at most width columns, keeping the minimum
+        and maximum of the samples in each column. The result is cached
+        until new samples are added.
+
+        Parameters
+        ----------
+        width : int
+            Number of pixel columns
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray)
+            Minimum and maximum of each column; if there are fewer samples
+            than columns, both are the samples themselves
+        """
+
+        if(self.envelope_cache[:2] == (self.count, width)):
+            return(self.envelope_cache[2])
+
+        samples = self.get_samples()
+        if(len(samples) <= width):
+            envelope = (samples, samples)
+        else:
+            # first sample of each column; columns differ by at most one
+            # sample in length
+            starts = (numpy.arange(width) * len(samples)) // width
+            envelope = (
+                numpy.minimum.reduceat(samples, starts),
+                numpy.maximum.reduceat(samples, starts))
+
+        self.envelope_cache = (self.count, width, envelope)
+        return(envelope)
@@ -0,0 +1,163 @@
+# spatial_grid.py
+# uniform grid over primitive bounding boxes, for viewport culling
+
+
+#   --------------------------------
+#
+#   Spatial grid
+#
+#   --------------------------------
+
+class spatial_grid:
+
+    """
+    Uniform grid index of bounding boxes. The grid covers the union of the
+    boxes, with about one cell per box.
+
+    Attributes
+    ----------
+    max_cells : int
+        Boxes spanning more cells than this are not inserted into the grid,
+        and are returned by every query instead
+
+    Created by __init__:
+    extent : float[4]
+        (x_min, y_min, x_max, y_max) of all boxes
+    cell_size : float[2]
+        Width and height of a cell
+    columns : int
+        Number of cells in each row
+    rows : int
+        Number of cells in each column
+    cells : dict
+        Indices of the boxes intersecting each cell, keyed by (column, row)
+    always : int[]
+        Indices of boxes returned by every query
+    """
+
+    max_cells = 64
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, boxes):
+
+        """
+        Build a grid index.
+
+        Parameters
+        ----------
+        boxes : array
+            (x_min, y_min, x_max, y_max) of each item, or None for items
+            that should be returned by every query
+        """
+
+        self.always = [i for i, box in enumerate(boxes) if box is None]
+        indexed = [
+            (i, box) for i, box in enumerate(boxes) if box is not None]
+
+        self.cells = {}
+        if(len(indexed) == 0):
+            self.extent = (0, 0, 0, 0)
+            self.cell_size = (1, 1)
+            self.columns = 1
+            self.rows = 1
+            return
+
+        self.extent = (
+            min(box[0] for i, box in indexed),
+            min(box[1] for i, box in indexed),
+            max(box[2] for i, box in indexed),
+            max(box[3] for i, box in indexed))
+
+        # about one cell per box
+        side = max(1, int(len(indexed) ** 0.5))
+        self.columns = side
+        self.rows = side
+        self.cell_size = (
+            max(self.extent[2] - self.extent[0], 1e-9) / side,
+            max(self.extent[3] - self.extent[1], 1e-9) / side)
+
+        for i, box in indexed:
+            x_min, y_min, x_max, y_max = self.cell_range(box)
+            if((x_max - x_min + 1) * (y_max - y_min + 1) > self.max_cells):
+                self.always.append(i)
+                continue
+            for x in range(x_min, x_max + 1):
+                for y in range(y_min, y_max + 1):
+                    try:
+                        self.cells[(x, y)].append(i)
+                    except KeyError:
+                        self.cells[(x, y)] = [i]
+
+    #   --------------------------------
+    #
+    #   Cell coordinates
+    #
+    #   --------------------------------
+    def cell_range(self, box):
+
+        """
+        Get the range of cells covered by a box, clipped to the grid.
+
+        Parameters
+        ----------
+        box : float[4]
+            (x_min, y_min, x_max, y_max)
+
+        Returns
+        -------
+        int[4]
+            (first column, first row, last column, last row)
+        """
+
+        def clip(value, limit):
+            return(min(max(int(value), 0), limit - 1))
+
+        return(
+            clip((box[0] - self.extent[0]) / self.cell_size[0], self.columns),
+            clip((box[1] - self.extent[1]) / self.cell_size[1], self.rows),
+            clip((box[2] - self.extent[0]) / self.cell_size[0], self.columns),
+            clip((box[3] - self.extent[1]) / self.cell_size[1], self.rows))
+
+    #   --------------------------------
+    #
+    #   Query
+    #
+    #   --------------------------------
+    def query(self, box):
+
+        """
+        Find the items that may intersect a box.
+
+        Parameters
+        ----------
+        box : float[4]
+            (x_min, y_min, x_max, y_max)
+
+        Returns
+        -------
+        int[] or None
+            Sorted indices of the items; None if the box covers the whole
+            grid, so that every item should be used
+        """
+
+        if(box[0] <= self.extent[0] and box[1] <= self.extent[1] and
+           box[2] >= self.extent[2] and box[3] >= self.extent[3]):
+            return(None)
+
+        found = set(self.always)
+
+        # no overlap with the grid
+        if(box[0] > self.extent[2] or box[2] < self.extent[0] or
+           box[1] > self.extent[3] or box[3] < self.extent[1]):
+            return(sorted(found))
+
+        x_min, y_min, x_max, y_max = self.cell_range(box)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                found.update(self.cells.get((x, y), ()))
+
+        return(sorted(found))
@@ -1,8 +1,12 @@
 # vector_graphics_window.py
 # vector graphics base class
 
+import copy
 import time
 from .base_graphics import *
+from .plot_buffer import *
+from ..buffer_lib.buffer import frame_buffer
+from ..buffer_lib.buffer import shared_prefix, shared_suffix
 
 
 #   --------------------------------
@@ -16,8 +20,126 @@ class vector_graphics_window(base_graphics):
     """
     Pygame window class; creates vector graphics rendering window
     Extends base_graphics
+
+    Attributes
+    ----------
+    cached_underlay : dict
+        Cached underlay methods. Keys are names of methods that draw onto
+        self.screen; values are the names of the main settings each method
+        depends on. Each method is drawn onto a cached surface, which is
+        re-rendered only when one of its settings or the window size
+        changes, or invalidate_layer is called; it is drawn after
+        show_underlay.
+    cached_overlay : dict
+        Cached overlay methods, as in cached_underlay; drawn after
+        show_overlay.
+    state_ops : str[]
+        Opcodes that change the drawing state (colors, transform, ...)
+        rather than draw; they are executed every frame even when the rest
+        of a static part is drawn from its cached surface.
+    timed_names : dict
+        Opcode that the time of each draw call added by optimize_ops is
+        reported under in render_times, keyed by the call's opcode
+
+    Created by __init__:
+    render_count : int
+        Number of screen updates so far
+    sample_render : bool
+        True if draw calls are being timed during the current update
+    render_times : dict
+        Time (seconds) spent on each opcode in the most recently sampled
+        frame, keyed by device
+    cache_stats : dict
+        [hits, misses] for each graphics cache, keyed by cache name
+    stats_lines : str[]
+        Lines shown by the statistics overlay
+    plots : dict
+        plot_buffer for each logf label, keyed by label
+    plot_pending : dict
+        logf samples received since the last flush_plots, keyed by label;
+        only labels in settings.plot_labels are collected
+    plot_seen : set
+        Every logf label received, plotted or not
+    draw_functions : dict
+        Draw function for each opcode ID, filled in as opcodes are first
+        drawn
+    layers : dict
+        Cached layer of each device, keyed by device: a dict with the
+        rendered "surface", the "frame" it shows, and the "key" returned by
+        layer_key when it was rendered
+    static_layers : dict
+        Cached underlay and overlay layers, keyed by method name: a dict
+        with the rendered "surface" and the "key" it was rendered with
+    static_parts : dict
+        Static part detection for each device, keyed by device: a dict with
+        the last "frame" seen, the "streak" of frames sharing at least
+        "prefix" leading and "suffix" trailing instructions with the frame
+        before, and the promoted "parts" (None until promoted); see
+        update_static
+    info_panel : tuple
+        (information rows, rendered surface) of the frame information
+        panel; None until first shown
+    info_fps : dict
+        Last fps reading shown for each device, as a string
+    info_refresh : tuple
+        (time of the last fps refresh, render_count when last checked,
+        whether a refresh is due during that update)
+    fps_text : pygame.Surface
+        Rendered fps readout; None until first shown
     """
 
+    cached_underlay = {}
+    cached_overlay = {}
+    state_ops = []
+    timed_names = {}
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, settings, error_handler):
+
+        """
+        Create a vector graphics window.
+
+        Parameters
+        ----------
+        settings: sv_settings object
+            object containing settings to be used
+        error_handler: error_handler object
+            object containing error handling methods
+        """
+
+        base_graphics.__init__(self, settings, error_handler)
+
+        # render statistics
+        self.render_count = 0
+        self.sample_render = False
+        self.render_times = {}
+        self.cache_stats = {
+            "frame": [0, 0], "layer": [0, 0], "static": [0, 0]}
+        self.stats_lines = []
+
+        # logf plots
+        self.plots = {}
+        self.plot_pending = {}
+        self.plot_seen = set()
+
+        # draw function memo table
+        self.draw_functions = {}
+
+        # per device layers
+        self.layers = {}
+        self.static_layers = {}
+        self.static_parts = {}
+
+        # information panel
+        self.info_panel = None
+        self.info_fps = {}
+        self.info_refresh = (0, -1, False)
+        self.fps_text = None
+
     #   --------------------------------
     #
     #   Update screen
@@ -39,31 +161,38 @@ class vector_graphics_window(base_graphics):
 
         # show underlay
         self.show_underlay()
+        for name, fields in self.cached_underlay.items():
+            self.show_static_layer(name, fields)
+
+        # time draw calls once every settings.stats_sample_interval updates
+        interval = self.settings["main"].stats_sample_interval
+        self.sample_render = (
+            interval > 0 and self.render_count % interval == 0)
+        self.render_count += 1
 
         # draw each frame buffer
         for device, frame_buffer in frame_buffers.items():
+            if(self.settings["main"].layer_cache):
+                self.render_layer(frame_buffer, device)
+            else:
+                self.render_frame(frame_buffer, device)
 
-            # render each instruction
-            for instruction in frame_buffer.instructions:
-
-                # run through default draw functions
-                try:
-                    draw_function = getattr(self, instruction[0])
-                    draw_function(instruction, device)
-                # raise AttributeError
-                # if the requested instruction doesn't exist.
-                except AttributeError:
-                    self.error_handler.raise_error(
-                        "onf", instruction, instruction[0])
+        # draw logf plots
+        if(len(self.settings["main"].plot_labels) > 0):
+            self.show_plots()
 
         # show frame id and fps
         if(self.settings["main"].show_frame_id):
             self.show_frame_id(frame_buffers)
         if(self.settings["main"].show_fps):
             self.show_fps()
+        if(self.settings["main"].show_latency):
+            self.show_latency(frame_buffers)
 
         # show overlay
         self.show_overlay()
+        for name, fields in self.cached_overlay.items():
+            self.show_static_layer(name, fields)
 
         # add in command line state
         if(command_mode):
@@ -76,9 +205,582 @@ class vector_graphics_window(base_graphics):
         # display pygame buffer
         pygame.display.flip()
 
+        # record serial to screen latency
+        for device, frame_buffer in frame_buffers.items():
+            self.update_latency(frame_buffer, device)
+
         # limit the fps
         self.clock.tick(self.settings["main"].frame_limit)
 
+    #   --------------------------------
+    #
+    #   Render frame buffer
+    #
+    #   --------------------------------
+    def render_frame(self, frame_buffer, device):
+
+        """
+        Draw a frame buffer onto the screen.
+
+        Parameters
+        ----------
+        frame_buffer : frame_buffer object
+            Frame to be drawn
+        device : str
+            Name of the device the frame belongs to
+        """
+
+        # frames with promoted static parts only draw their changing part
+        parts = self.update_static(frame_buffer, device)
+        if(parts is None):
+            ops = self.prepare_frame(frame_buffer)
+        else:
+            self.render_static(parts["prefix"], device)
+            ops = self.prepare_dynamic(frame_buffer, parts)
+
+        if(self.sample_render):
+            self.render_timed(ops, device)
+        else:
+            # render each instruction
+            for draw_function, instruction in ops:
+                try:
+                    draw_function(instruction, device)
+                except AttributeError:
+                    self.error_handler.raise_error(
+                        "onf", instruction, instruction[0])
+
+        if(parts is not None):
+            self.render_static(parts["suffix"], device)
+
+    def render_layer(self, frame_buffer, device):
+
+        """
+        Draw a frame buffer through the device's cached layer. The layer is
+        only re-rendered if the frame or layer_key changed since it was last
+        rendered; otherwise, the cached layer is blitted as is.
+
+        Parameters
+        ----------
+        frame_buffer : frame_buffer object
+            Frame to be drawn
+        device : str
+            Name of the device the frame belongs to
+        """
+
+        layer = self.layers.get(device)
+        key = self.layer_key(device)
+
+        if(layer is not None and
+           layer["frame"] is frame_buffer and layer["key"] == key):
+            self.cache_stats["layer"][0] += 1
+
+        else:
+            self.cache_stats["layer"][1] += 1
+            if(layer is None or
+               layer["surface"].get_size() != self.screen.get_size()):
+                layer = {"surface": pygame.Surface(
+                    self.screen.get_size(), pygame.SRCALPHA)}
+                self.layers[device] = layer
+
+            self.draw_on_surface(
+                layer["surface"], self.render_frame, frame_buffer, device)
+
+            layer["frame"] = frame_buffer
+            # drawing may change the settings (setscale, definecolor, ...)
+            layer["key"] = self.layer_key(device)
+
+        self.screen.blit(layer["surface"], (0, 0))
+
+    def draw_on_surface(self, surface, draw_function, *args):
+
+        """
+        Clear a surface, and call a function that draws onto self.screen
+        with self.screen pointing at the surface instead.
+
+        Parameters
+        ----------
+        surface : pygame.Surface
+            Surface to draw onto; should have an alpha channel
+        draw_function : function
+            Function to call
+        *args
+            Arguments for draw_function
+        """
+
+        surface.fill((0, 0, 0, 0))
+
+        screen = self.screen
+        self.screen = surface
+        try:
+            draw_function(*args)
+        finally:
+            self.screen = screen
+
+    def layer_key(self, device):
+
+        """
+        Get the settings a device's layer depends on, other than its frame.
+        The colors are copied into the key, so that a replaced or modified
+        colors dictionary is always detected; used by both the frame layers
+        and the static parts.
+
+        Parameters
+        ----------
+        device : str
+            Name of the device
+
+        Returns
+        -------
+        tuple
+            Layer settings
+        """
+
+        settings = self.settings[device]
+        return((
+            settings.scale,
+            tuple(settings.offset),
+            settings.line_width,
+            tuple(sorted(settings.colors.items())),
+            self.settings["main"].view_zoom,
+            tuple(self.settings["main"].view_pan)))
+
+    def render_timed(self, ops, device, times=None):
+
+        """
+        Draw prepared instructions, timing each draw call; the totals for
+        each opcode are stored in render_times. Calls added by optimize_ops
+        are reported under the opcodes they replace: calls that group
+        other calls are expanded with timed_ops, and each call's own time
+        is reported under its name in timed_names.
+
+        Parameters
+        ----------
+        ops : array
+            List of (draw function, instruction) pairs
+        device : str
+            Name of the device the instructions belong to
+        times : dict
+            Totals to add to when timing the calls of a group; None to
+            start a new frame
+        """
+
+        frame_times = {} if times is None else times
+
+        for draw_function, instruction in ops:
+            opcode = self.timed_names.get(instruction[0], instruction[0])
+
+            start_time = time.perf_counter()
+            inner = self.timed_ops(instruction, device)
+            if(inner is None):
+                try:
+                    draw_function(instruction, device)
+                except AttributeError:
+                    self.error_handler.raise_error(
+                        "onf", instruction, instruction[0])
+            frame_times[opcode] = (
+                frame_times.get(opcode, 0) +
+                time.perf_counter() - start_time)
+
+            if(inner is not None):
+                self.render_timed(inner, device, frame_times)
+
+        if(times is None):
+            self.render_times[device] = frame_times
+
+    def timed_ops(self, instruction, device):
+
+        """
+        Get the draw calls that a call added by optimize_ops stands for, so
+        that render_timed can time them individually; the call itself is
+        then charged only for the time spent in timed_ops. By default,
+        calls are drawn as they are.
+
+        Parameters
+        ----------
+        instruction : array
+            Instruction of the draw call
+        device : str
+            Name of the device the instruction belongs to
+
+        Returns
+        -------
+        array or None
+            List of (draw function, instruction) pairs to draw instead, or
+            None to draw the call itself
+        """
+
+        return(None)
+
+    #   --------------------------------
+    #
+    #   Static part detection
+    #
+    #   --------------------------------
+    def update_static(self, frame_buffer, device):
+
+        """
+        Track the instructions that a device's frames share with the frame
+        before. Once settings.static_min_frames consecutive frames have
+        shared at least settings.static_min_ops leading and trailing
+        instructions, the shared instructions are promoted to static parts,
+        which are drawn from cached surfaces. If a later frame doesn't
+        contain a static part, the parts are dropped, and detection starts
+        over.
+
+        Parameters
+        ----------
+        frame_buffer : frame_buffer object
+            Frame about to be drawn
+        device : str
+            Name of the device the frame belongs to
+
+        Returns
+        -------
+        dict or None
+            "prefix" and "suffix" static parts (see make_static_part); None
+            if the device has no static parts
+        """
+
+        main = self.settings["main"]
+        if(not main.static_layer or frame_buffer.frame_id == -1):
+            return(None)
+
+        info = self.static_parts.get(device)
+        if(info is None):
+            self.static_parts[device] = {
+                "frame": frame_buffer, "streak": 0,
+                "prefix": 0, "suffix": 0, "parts": None}
+            return(None)
+
+        # same frame as last time (window redrawn, scrolled, ...)
+        if(info["frame"] is frame_buffer):
+            return(info["parts"])
+
+        previous = info["frame"].instructions
+        instructions = frame_buffer.instructions
+        info["frame"] = frame_buffer
+
+        # check that the promoted parts are still there; lists compare
+        # shared instructions by identity
+        parts = info["parts"]
+        if(parts is not None):
+            prefix = parts["prefix"]["frame"].instructions
+            suffix = parts["suffix"]["frame"].instructions
+            if(len(instructions) >= len(prefix) + len(suffix) and
+               instructions[:len(prefix)] == prefix and
+               instructions[len(instructions) - len(suffix):] == suffix):
+                return(parts)
+            info["parts"] = None
+            info["streak"] = 0
+
+        prefix = shared_prefix(instructions, previous)
+        suffix = shared_suffix(instructions, previous, prefix)
+        if(prefix + suffix < main.static_min_ops):
+            info["streak"] = 0
+            return(None)
+
+        if(info["streak"] == 0):
+            info["prefix"] = prefix
+            info["suffix"] = suffix
+        else:
+            info["prefix"] = min(info["prefix"], prefix)
+            info["suffix"] = min(info["suffix"], suffix)
+        info["streak"] += 1
+
+        if(info["streak"] >= main.static_min_frames and
+           info["prefix"] + info["suffix"] >= main.static_min_ops):
+            info["parts"] = {
+                "prefix": self.make_static_part(
+                    instructions[:info["prefix"]]),
+                "suffix": self.make_static_part(
+                    instructions[len(instructions) - info["suffix"]:])}
+
+        return(info["parts"])
+
+    def make_static_part(self, instructions):
+
+        """
+        Create a static part.
+
+        Parameters
+        ----------
+        instructions : instruction[]
+            Instructions of the part
+
+        Returns
+        -------
+        dict
+            "frame": pseudo-frame holding the instructions, so that their
+                draw calls are prepared and cached like any frame's
+            "state": (draw function, instruction) pairs of the state
+                instructions, executed whenever the cached surface is used
+            "surface": cached surface; None until drawn
+            "key": layer_key at the start of the part when it was drawn
+        """
+
+        state = []
+        for instruction in instructions:
+            if(instruction[0] in self.state_ops):
+                state.append((getattr(self, instruction[0]), instruction))
+
+        return({
+            "frame": make_pseudo_frame(instructions), "state": state,
+            "surface": None, "key": None})
+
+    def render_static(self, part, device):
+
+        """
+        Draw a static part from its cached surface, drawing the surface
+        first if it is missing or was drawn with different settings. State
+        instructions in the part are always executed, so that the drawing
+        state is the same as if the part had been drawn.
+
+        Parameters
+        ----------
+        part : dict
+            Static part, as returned by make_static_part
+        device : str
+            Name of the device the part belongs to
+        """
+
+        if(len(part["frame"].instructions) == 0):
+            return
+
+        key = self.layer_key(device)
+        if(part["surface"] is not None and part["key"] == key and
+           part["surface"].get_size() == self.screen.get_size()):
+            self.cache_stats["static"][0] += 1
+            for draw_function, instruction in part["state"]:
+                draw_function(instruction, device)
+
+        else:
+            self.cache_stats["static"][1] += 1
+            if(part["surface"] is None or
+               part["surface"].get_size() != self.screen.get_size()):
+                part["surface"] = pygame.Surface(
+                    self.screen.get_size(), pygame.SRCALPHA)
+            part["key"] = key
+
+            def draw_part():
+                for draw_function, instruction in self.prepare_frame(
+                        part["frame"]):
+                    draw_function(instruction, device)
+            self.draw_on_surface(part["surface"], draw_part)
+
+        self.screen.blit(part["surface"], (0, 0))
+
+    def prepare_dynamic(self, frame_buffer, parts):
+
+        """
+        Get the draw calls for the instructions of a frame between its
+        static parts; cached in frame_buffer.cache for the parts they were
+        prepared for.
+
+        Parameters
+        ----------
+        frame_buffer : frame_buffer object
+            Frame to be prepared
+        parts : dict
+            Static parts, as returned by update_static
+
+        Returns
+        -------
+        array
+            List of (draw function, instruction) pairs
+        """
+
+        cached = frame_buffer.cache.get("dynamic")
+        if(cached is not None and cached[0] is parts):
+            return(cached[1])
+
+        instructions = frame_buffer.instructions
+        ops = self.prepare_frame(make_pseudo_frame(instructions[
+            len(parts["prefix"]["frame"].instructions):
+            len(instructions) - len(parts["suffix"]["frame"].instructions)]))
+        frame_buffer.cache["dynamic"] = (parts, ops)
+        return(ops)
+
+    #   --------------------------------
+    #
+    #   Prepare frame buffer for drawing
+    #
+    #   --------------------------------
+    def prepare_frame(self, frame_buffer):
+
+        """
+        Get the draw calls for a frame buffer. The draw function for each
+        instruction is looked up once, the first time the frame is drawn,
+        and cached in frame_buffer.cache; frames that are never displayed
+        are never prepared. Draw functions are found by opcode ID in
+        draw_functions, falling back to the opcode name.
+
+        Parameters
+        ----------
+        frame_buffer : frame_buffer object
+            Frame to be prepared
+
+        Returns
+        -------
+        array
+            List of (draw function, instruction) pairs
+        """
+
+        if("ops" in frame_buffer.cache):
+            self.cache_stats["frame"][0] += 1
+            return(frame_buffer.cache["ops"])
+        self.cache_stats["frame"][1] += 1
+
+        draw_functions = self.draw_functions
+        ops = []
+        for instruction in frame_buffer.instructions:
+            opid = registry.get_opid(instruction)
+            draw_function = draw_functions.get(opid)
+
+            # draw functions are selected using their name, which must match
+            # the name given in the command registry
+            if(draw_function is None):
+                try:
+                    draw_function = getattr(self, instruction[0])
+                except AttributeError:
+                    self.error_handler.raise_error(
+                        "onf", instruction, instruction[0])
+                    continue
+                if(opid != UNKNOWN):
+                    draw_functions[opid] = draw_function
+
+            ops.append((draw_function, instruction))
+
+        ops = self.optimize_ops(ops)
+
+        frame_buffer.cache["ops"] = ops
+        return(ops)
+
+    def optimize_ops(self, ops):
+
+        """
+        Rewrite the draw calls of a frame before they are cached; called by
+        prepare_frame. By default, the calls are returned unchanged.
+
+        Parameters
+        ----------
+        ops : array
+            List of (draw function, instruction) pairs
+
+        Returns
+        -------
+        array
+            List of (draw function, instruction) pairs to be drawn instead
+        """
+
+        return(ops)
+
+    #   --------------------------------
+    #
+    #   logf plots
+    #
+    #   --------------------------------
+    def update_plot(self, instruction):
+
+        """
+        Record a logf sample for plotting. Samples are only stored here;
+        they are moved into each label's plot_buffer by flush_plots.
+        Labels that are not plotted are not collected, so a plot starts
+        when its label is toggled on.
+
+        Parameters
+        ----------
+        instruction : array
+            logf instruction
+        """
+
+        if(not plot_buffer.enabled):
+            return
+
+        # only labels in settings.plot_labels are collected; others are
+        # only recorded as seen, so that they can be listed
+        label = instruction[1]
+        if(label not in self.settings["main"].plot_labels):
+            self.plot_seen.add(label)
+            return
+
+        try:
+            self.plot_pending[label].append(instruction[2])
+        except KeyError:
+            self.plot_pending[label] = [instruction[2]]
+
+    def flush_plots(self):
+
+        """
+        Move samples recorded by update_plot into the plot buffers.
+        """
+
+        for label, samples in self.plot_pending.items():
+            if(label not in self.plots):
+                self.plots[label] = plot_buffer(
+                    self.settings["main"].plot_size)
+                self.plot_seen.add(label)
+            self.plots[label].add_samples(samples)
+
+        self.plot_pending = {}
+
+    def show_plots(self):
+
+        """
+        Draw a rolling plot of each label in settings.plot_labels, stacked
+        up from the bottom of the window. Each plot is scaled to the range
+        of its samples, and drawn as a min/max envelope once there is more
+        than one sample per pixel column.
+        """
+
+        main = self.settings["main"]
+        textfont = self.get_font(main.font, main.font_size)
+
+        left = 10
+        width = main.window_size[0] - 20
+        bottom = main.window_size[1] - 2 * main.font_size
+
+        for i, label in enumerate(main.plot_labels):
+            if(label not in self.plots or self.plots[label].count == 0):
+                continue
+
+            color = main.plot_colors[i % len(main.plot_colors)]
+            mins, maxs = self.plots[label].get_envelope(width)
+
+            low = float(mins.min())
+            high = float(maxs.max())
+            span = (high - low) if high > low else 1.0
+
+            # newest sample at the right edge
+            x = left + width - len(mins) + numpy.arange(len(mins))
+
+            def y_coord(values):
+                return(bottom - (values - low) * (main.plot_height / span))
+
+            # one sample per column: plain line
+            if(mins is maxs):
+                if(len(mins) > 1):
+                    pygame.draw.lines(
+                        self.screen, color, False,
+                        numpy.column_stack((x, y_coord(mins))).tolist())
+            # several samples per column: filled envelope
+            else:
+                pygame.draw.polygon(
+                    self.screen, color,
+                    numpy.column_stack((
+                        numpy.concatenate((x, x[::-1])),
+                        numpy.concatenate((
+                            y_coord(maxs), y_coord(mins)[::-1]))
+                    )).tolist())
+
+            textframe = textfont.render(
+                label + " [" + str(round(low, 3)) + ", " +
+                str(round(high, 3)) + "]",
+                False, color)
+            self.screen.blit(
+                textframe, (left, bottom - main.plot_height - main.font_size))
+
+            bottom -= main.plot_height + 2 * main.font_size
+
     #   --------------------------------
     #
     #   Display fps and frame id
@@ -87,83 +789,167 @@ class vector_graphics_window(base_graphics):
     def show_frame_id(self, frame_buffers):
 
         """
-        Display the frame information at the top left.
+        Display the frame information at the top left. The panel is
+        rendered once and cached; it is re-rendered when a displayed frame,
+        path or fps reading changes. fps readings are refreshed at
+        settings.info_refresh_rate Hz.
         """
 
-        info = [["device", "fps", "frame_id", "timestamp", "path"]]
+        main = self.settings["main"]
 
-        textfont = pygame.font.SysFont(
-            self.settings["main"].font, self.settings["main"].font_size)
+        # refresh fps readings
+        if(self.refresh_info()):
+            self.info_fps = dict(
+                (device, str(round(self.compute_fps(device), 2)))
+                for device in frame_buffers)
 
-        # display information for each buffer
-        for device, frame_buffer in frame_buffers.items():
+        # build information array; timestamps are formatted on render
+        info = [
+            (device, self.info_fps.get(device, "0"), frame_buffer.frame_id,
+             int(frame_buffer.timestamp), self.settings[device].path)
+            for device, frame_buffer in frame_buffers.items()]
 
-            # generate time string
-            timef = time.localtime(frame_buffer.timestamp)
-            timel = (str(timef.tm_hour), str(timef.tm_min), str(timef.tm_sec))
-            for value in timel:
-                if(len(value) == 1):
-                    value = "0" + value
-            timestr = timel[0] + ":" + timel[1] + ":" + timel[2]
+        # re-render only on change
+        if(self.info_panel is None or self.info_panel[0] != info):
 
-            # get fps
-            fps = str(round(self.compute_fps(device), 2))
+            rows = [["device", "fps", "frame_id", "timestamp", "path"]]
+            for device, fps, frame_id, timestamp, path in info:
+                rows.append([
+                    device, fps, str(frame_id),
+                    time.strftime("%H:%M:%S", time.localtime(timestamp)),
+                    path])
 
-            # build information array
-            info.append([
-                device, fps, str(frame_buffer.frame_id),
-                timestr, self.settings[device].path])
+            # pad with spaces as defined in settings.display_spacing
+            lines = [
+                "".join(
+                    entry.ljust(spacing)
+                    for entry, spacing in zip(row, main.display_spacing))
+                for row in rows]
 
-        # render each entry
-        line = 0
-        for info_line in info:
+            textfont = self.get_font(main.font, main.font_size)
+            textframes = [
+                textfont.render(line, False, main.colors["black"])
+                for line in lines]
 
-            # pad with spaces as defined in settings.display_spacing
-            assembled_string = ""
-            for i in range(5):
-                if(len(info_line[i]) <
-                   self.settings["main"].display_spacing[i]):
-                    info_line[i] += (
-                        " " * (self.settings["main"].display_spacing[i] -
-                               len(info_line[i])))
-                assembled_string += info_line[i]
+            # move down by settings.font_size each line
+            panel = pygame.Surface(
+                (max(textframe.get_size()[0] for textframe in textframes),
+                 len(textframes) * main.font_size),
+                pygame.SRCALPHA)
+            for i, textframe in enumerate(textframes):
+                panel.blit(textframe, (0, i * main.font_size))
 
-            textframe = textfont.render(
-                assembled_string,
-                False,
-                self.settings["main"].colors["black"])
+            self.info_panel = (info, panel)
 
-            # move down by settings.font_size each time
-            self.screen.blit(
-                textframe, (10, 10 + line * self.settings["main"].font_size))
-            line += 1
+        self.screen.blit(self.info_panel[1], (10, 10))
 
     def show_fps(self):
 
         """
-        Display the current fps at the bottom left.
+        Display the current fps at the top right, refreshed at
+        settings.info_refresh_rate Hz.
         """
 
-        textfont = pygame.font.SysFont(
-            self.settings["main"].font, self.settings["main"].font_size)
-        textframe = textfont.render(
-            "fps = " + str(round(self.clock.get_fps(), 2)),
-            False,
-            self.settings["main"].colors["black"])
+        main = self.settings["main"]
+
+        if(self.fps_text is None or self.refresh_info()):
+            textfont = self.get_font(main.font, main.font_size)
+            self.fps_text = textfont.render(
+                "fps = " + str(round(self.clock.get_fps(), 2)),
+                False,
+                main.colors["black"])
+
         self.screen.blit(
-            textframe,
-            (self.settings["main"].window_size[0] -
-             10 -
-             textframe.get_size()[0],
-             10))
+            self.fps_text,
+            (main.window_size[0] - 10 - self.fps_text.get_size()[0], 10))
+
+    def refresh_info(self):
+
+        """
+        Check whether fps readings are due for a refresh. Readings are
+        refreshed at most settings.info_refresh_rate times per second; every
+        caller sees the same refresh during an update.
+
+        Returns
+        -------
+        bool
+            True if readings should be refreshed during this update
+        """
+
+        if(self.render_count != self.info_refresh[1]):
+            now = time.time()
+            due = now > (
+                self.info_refresh[0] +
+                1.0 / self.settings["main"].info_refresh_rate)
+            self.info_refresh = (
+                now if due else self.info_refresh[0], self.render_count, due)
+
+        return(self.info_refresh[2])
+
+    def show_latency(self, frame_buffers):
+
+        """
+        Display serial to screen latency (p50/p99, in ms) for each device at
+        the top right, below the fps.
+        """
+
+        textfont = self.get_font(
+            self.settings["main"].font, self.settings["main"].font_size)
+
+        line = 1
+        for device in frame_buffers:
+            summary = self.compute_latency(device)
+            if(not summary):
+                continue
+
+            # total latency, followed by each stage
+            text = device + " ms p50/p99:"
+            for stage in ["total"] + self.latency[device].stages:
+                text += (
+                    " " + stage + " " +
+                    str(round(summary[stage][0] * 1000, 1)) + "/" +
+                    str(round(summary[stage][1] * 1000, 1)))
+
+            textframe = textfont.render(
+                text, False, self.settings["main"].colors["black"])
+            self.screen.blit(
+                textframe,
+                (self.settings["main"].window_size[0] -
+                 10 -
+                 textframe.get_size()[0],
+                 10 + line * self.settings["main"].font_size))
+            line += 1
 
     #   --------------------------------
     #
-    #   dummy function for overlay support
+    #   overlay; shows statistics if enabled
     #
     #   --------------------------------
     def show_overlay(self):
-        pass
+
+        """
+        Draw the overlay. By default, this shows stats_lines at the bottom
+        left if settings.show_stats is set; extensions that override this
+        should call vector_graphics_window.show_overlay to keep it.
+        """
+
+        if(not self.settings["main"].show_stats):
+            return
+
+        textfont = self.get_font(
+            self.settings["main"].font, self.settings["main"].font_size)
+
+        # leave room for the command line at the bottom
+        line = len(self.stats_lines) + 2
+        for text in self.stats_lines:
+            textframe = textfont.render(
+                text, False, self.settings["main"].colors["black"])
+            self.screen.blit(
+                textframe,
+                (10,
+                 self.settings["main"].window_size[1] -
+                 line * self.settings["main"].font_size))
+            line -= 1
 
     #   --------------------------------
     #
@@ -173,6 +959,65 @@ class vector_graphics_window(base_graphics):
     def show_underlay(self):
         pass
 
+    #   --------------------------------
+    #
+    #   cached underlay and overlay layers
+    #
+    #   --------------------------------
+    def show_static_layer(self, name, fields):
+
+        """
+        Blit a cached underlay or overlay layer, re-rendering it first if
+        it is new, invalidated, or its settings or the window size changed.
+
+        Parameters
+        ----------
+        name : str
+            Name of the method that draws the layer
+        fields : str[]
+            Names of the main settings the layer depends on
+        """
+
+        key = [self.screen.get_size()] + [
+            getattr(self.settings["main"], field) for field in fields]
+
+        layer = self.static_layers.get(name)
+        if(layer is not None and layer["key"] == key):
+            self.cache_stats["layer"][0] += 1
+
+        else:
+            self.cache_stats["layer"][1] += 1
+            if(layer is None or
+               layer["surface"].get_size() != self.screen.get_size()):
+                layer = {"surface": pygame.Surface(
+                    self.screen.get_size(), pygame.SRCALPHA)}
+                self.static_layers[name] = layer
+
+            # store a copy, so that settings changed in place (such as
+            # appending to a list) are detected
+            self.draw_on_surface(layer["surface"], getattr(self, name))
+            layer["key"] = copy.deepcopy(key)
+
+        self.screen.blit(layer["surface"], (0, 0))
+
+    def invalidate_layer(self, name=None):
+
+        """
+        Force a cached underlay or overlay layer to be re-rendered the next
+        time it is shown; for layers that depend on more than settings.
+
+        Parameters
+        ----------
+        name : str
+            Name of the layer's method; if None, every cached underlay and
+            overlay layer is invalidated
+        """
+
+        if(name is None):
+            self.static_layers = {}
+        else:
+            self.static_layers.pop(name, None)
+
     #   --------------------------------
     #
     #   get color; safely retrieve color. defaults to black.
@@ -200,3 +1045,30 @@ class vector_graphics_window(base_graphics):
             return(self.settings[target].colors[colorname])
         except KeyError:
             return(self.settings[target].colors["black"])
+
+
+#   --------------------------------
+#
+#   Pseudo-frame
+#
+#   --------------------------------
+def make_pseudo_frame(instructions):
+
+    """
+    Create a frame buffer holding part of a frame's instructions, so that
+    their draw calls can be prepared and cached by prepare_frame.
+
+    Parameters
+    ----------
+    instructions : instruction[]
+        Instructions of the pseudo-frame
+
+    Returns
+    -------
+    frame_buffer
+        Frame buffer, with frame ID -1
+    """
+
+    pseudo_frame = frame_buffer()
+    pseudo_frame.instructions = instructions
+    return(pseudo_frame)
@@ -6,6 +6,7 @@ __all__ = [
     # "bin_device",
     "bin_parser",
     "hexutil",
+    "opcode_registry",
     "base_device",
     "threaded_serial"
 ]
@@ -16,4 +17,5 @@ from .ascii_parser import ascii_parser
 # from bin_device import bin_device
 from .bin_parser import bin_parser
 from .base_device import base_device
+from .opcode_registry import registry
 from .threaded_serial import threaded_serial
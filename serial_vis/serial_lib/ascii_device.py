@@ -43,12 +43,21 @@ class ascii_device(base_device):
         while(raw_line[0] == ""):
             # get line
             try:
-                raw_line = [self.device.readline().strip(), True]
+                data = self.device.readline()
             except (OSError, serial.serialutil.SerialException):
                 self.error_handler.raise_error("ddc", [], self.settings.path)
                 return(["", False])
+
+            # record arrival time and size for latency/throughput tracking;
+            # bytes include line endings and blank lines
+            self.read_time = time.time()
+            self.bytes_read += len(data)
+
+            raw_line = [
+                data.decode(self.settings.encoding, "replace").strip(), True]
+
             # timeout if the receive timeout has been reached
-            if(time.time() > timeout_time):
+            if(self.read_time > timeout_time):
                 return(["null", True])
 
         # verify checksum:
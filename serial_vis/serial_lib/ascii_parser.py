@@ -1,7 +1,10 @@
 # serial_parser.py
 # serial command interpretation class
 
+import time
+from collections import OrderedDict
 from .hexutil import *
+from .opcode_registry import *
 
 
 #   --------------------------------
@@ -18,13 +21,27 @@ class ascii_parser:
     Attributes
     ----------
     commands : dict
-        Format for registered commands
+        Format for registered commands; __init__ replaces this with a copy
+        that includes the user commands
 
     Created by __init__:
     error_handler : error_handler object
         Centralized error handling
     settings : sv_settings object
         Program settings
+    parse_time : float
+        Time that the most recent instruction finished parsing
+    parse_cache : OrderedDict
+        Parsed instructions, keyed by line, least recently used first; at
+        most settings.parse_cache_size are kept. Cached instructions are
+        returned for every repeat of their line, so instructions must not
+        be modified once parsed.
+    cache_mode : str
+        settings.number_mode that the cached instructions were parsed with
+    cache_hits : int
+        Number of lines found in parse_cache
+    cache_misses : int
+        Number of lines that had to be parsed
     """
 
     # default command dictionary
@@ -86,11 +103,26 @@ class ascii_parser:
             Object containing program settings
         """
 
+        # copy the default commands, so that user commands registered by
+        # one parser don't leak into the others
+        self.commands = dict(self.commands)
         self.commands.update(commands)
         self.settings = settings
 
+        # assign opcode IDs to every registered command
+        for opcode in self.commands:
+            registry.register(opcode)
+
         self.error_handler = error_handler
 
+        self.parse_time = 0
+
+        # parsed instruction cache
+        self.parse_cache = OrderedDict()
+        self.cache_mode = self.settings.number_mode
+        self.cache_hits = 0
+        self.cache_misses = 0
+
     #   --------------------------------
     #
     #   full package of parsing and processing
@@ -99,20 +131,47 @@ class ascii_parser:
     def process_command(self, code_line):
 
         """
-        Parse and process a line of code
+        Parse and process a line of code. Repeated lines (such as static
+        geometry sent every frame) are returned from parse_cache; lines
+        that raise errors are not cached, so their errors are reported
+        every time.
 
         Parameters
         ----------
         code_line : str
-            Raw instruction to be processed
+            Raw instruction to be processed, after checksum verification
 
         Returns
         -------
         array
-            Processed instruction
+            Processed instruction; shared with every repeat of the line
         """
 
-        return self.process_args(self.parse_line(code_line))
+        cache = self.parse_cache
+
+        # cached instructions depend on the number mode
+        if(self.cache_mode != self.settings.number_mode):
+            cache.clear()
+            self.cache_mode = self.settings.number_mode
+
+        instruction = cache.get(code_line)
+        if(instruction is not None):
+            cache.move_to_end(code_line)
+            self.cache_hits += 1
+
+        else:
+            self.cache_misses += 1
+            error_id = self.error_handler.error_id
+            instruction = self.process_args(self.parse_line(code_line))
+
+            if(self.settings.parse_cache_size > 0 and
+               self.error_handler.error_id == error_id):
+                cache[code_line] = instruction
+                if(len(cache) > self.settings.parse_cache_size):
+                    cache.popitem(last=False)
+
+        self.parse_time = time.time()
+        return(instruction)
 
     #   --------------------------------
     #
@@ -178,13 +237,14 @@ class ascii_parser:
 
         Returns
         -------
-        mixed array
-            Processed instruction
+        instruction
+            Processed instruction, tagged with its opcode ID
         """
 
-        arguments = []
+        arguments = instruction()
         opcode = raw_arguments[0]
         arguments.append(raw_arguments[0])
+        arguments.opid = registry.ids.get(opcode, UNKNOWN)
 
         if opcode in self.commands:
             command_length = len(self.commands[opcode]) + 1
@@ -209,7 +269,7 @@ class ascii_parser:
             if(n >= len(raw_arguments)):
                 self.error_handler.raise_error(
                     "nea", raw_arguments, raw_arguments[0])
-                raw_arguments.append(0)
+                raw_arguments.append("0")
 
             # single argument type
             if(argument_type == "d"):
@@ -23,6 +23,10 @@ class base_device:
         Program settings
     error_handler : error handler object
         Centralized error handling
+    read_time : float
+        Time that the most recent line was read
+    bytes_read : int
+        Total number of bytes read from the device
 
     Created by connect_device:
     device : serial.Serial object
@@ -55,6 +59,10 @@ class base_device:
         # message spam limiter
         self.next_time = 0
 
+        # latency and throughput tracking
+        self.read_time = 0
+        self.bytes_read = 0
+
     #   --------------------------------
     #
     #   search for device connection
@@ -1,6 +1,7 @@
 # serial_parser.py
 # serial command interpretation class
 
+import time
 from .hexutil import *
 
 
@@ -20,11 +21,14 @@ class bin_parser:
     opcodes : dict
         Definition of each opcode. Opcodes are one byte, 0x00 to 0xFF.
     commands : dict
-        Format for registered commands
+        Format for registered commands; __init__ replaces this with a copy
+        that includes the user commands
 
     Created by __init__:
     error_handler : error_handler object
         Centralized error handling
+    parse_time : float
+        Time that the most recent instruction finished parsing
     """
 
     # default opcode dictionary
@@ -44,7 +48,8 @@ class bin_parser:
         0x0C: "drawcircle",
         0x0D: "drawray",
         0x0E: "text",
-        0x0F: "textp"
+        0x0F: "textp",
+        0x10: "trigger"
     }
 
     # default command dictionary
@@ -52,6 +57,8 @@ class bin_parser:
         # control commands:
         # draw
         "draw": [],
+        # trigger immediate pause
+        "trigger": [],
         # logs: label, datastring
         "logs": ["s", "s"],
         # logf: label, data (float)
@@ -104,11 +111,42 @@ class bin_parser:
             Object containing program settings
         """
 
+        # copy the default commands, so that user commands registered by
+        # one parser don't leak into the others
+        self.commands = dict(self.commands)
         self.commands.update(commands)
         self.settings = settings
 
         self.error_handler = error_handler
 
+        self.parse_time = 0
+
+    #   --------------------------------
+    #
+    #   full package of parsing and processing
+    #
+    #   --------------------------------
+    def process_command(self, code_line):
+
+        """
+        Parse and process a line of code; called by threaded_serial, as
+        with ascii_parser.
+
+        Parameters
+        ----------
+        code_line : byte[] / str
+            Raw instruction to be processed
+
+        Returns
+        -------
+        mixed array
+            Processed instruction
+        """
+
+        instruction = self.process_line(code_line)
+        self.parse_time = time.time()
+        return(instruction)
+
     #   --------------------------------
     #
     #   Process line
@@ -1,6 +1,7 @@
 # hexutil.py
 # hex processing utility functions
 
+import binascii
 import struct
 
 
@@ -38,7 +39,7 @@ def to_int(string, number_mode):
     elif(number_mode == "hex"):
         try:
             datatype = {2: '!b', 4: '!h', 8: '!i', 16: '!q'}[len(string)]
-            return(struct.unpack(datatype, string.decode("hex"))[0])
+            return(struct.unpack(datatype, binascii.unhexlify(string))[0])
         except (ValueError, KeyError):
             return(0)
     return(0)
@@ -69,10 +70,10 @@ def to_float(string, number_mode):
     elif(number_mode == "hex"):
         try:
             if(len(string) == 8):
-                return(struct.unpack('!f', string.decode("hex"))[0])
+                return(struct.unpack('!f', binascii.unhexlify(string))[0])
             elif(len(string) == 16):
-                return(struct.unpack('!d', string.decode("hex"))[0])
-        except TypeError:
+                return(struct.unpack('!d', binascii.unhexlify(string))[0])
+        except (TypeError, ValueError):
             return(0.0)
     return(0)
 
@@ -0,0 +1,173 @@
+# opcode_registry.py
+# integer opcode IDs, assigned once when an instruction is parsed
+
+import threading
+from .bin_parser import bin_parser
+
+
+#   --------------------------------
+#
+#   Default opcode IDs; match bin_parser.opcodes
+#
+#   --------------------------------
+
+DRAW = 0x00
+LOGS = 0x01
+LOGF = 0x02
+LOGSTART = 0x03
+LOGEND = 0x04
+ECHO = 0x05
+NULL = 0x06
+TRIGGER = 0x10
+
+# opcode ID of unregistered opcodes
+UNKNOWN = -1
+
+
+#   --------------------------------
+#
+#   Parsed instruction
+#
+#   --------------------------------
+
+class instruction(list):
+
+    """
+    Parsed instruction; a list of [opcode, arguments...], as produced by the
+    parsers, that also carries the opcode's ID. The opcode name stays in
+    instruction[0], for extensions and saved files.
+
+    Attributes
+    ----------
+    opid : int
+        ID of instruction[0] in the opcode registry; UNKNOWN if the opcode
+        is not registered
+    """
+
+    __slots__ = ("opid",)
+
+
+#   --------------------------------
+#
+#   Opcode registry
+#
+#   --------------------------------
+
+class opcode_registry:
+
+    """
+    Registry of opcode IDs. Default opcodes keep their bin_parser.opcodes
+    byte; other registered opcodes (user commands) are assigned IDs from
+    first_user_id upward, in registration order. One registry (registry) is
+    shared by every parser and consumer, so IDs are the same for all
+    devices.
+
+    Attributes
+    ----------
+    first_user_id : int
+        First ID assigned to opcodes without a default ID
+
+    Created by __init__:
+    ids : dict
+        ID of each registered opcode, keyed by name
+    names : dict
+        Name of each registered opcode, keyed by ID
+    next_id : int
+        Next ID to assign
+    lock : threading.Lock
+        Guards registration; parsers run on device threads
+    """
+
+    first_user_id = 0x80
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, opcodes):
+
+        """
+        Create an opcode registry
+
+        Parameters
+        ----------
+        opcodes : dict
+            Default opcode names, keyed by ID
+        """
+
+        self.ids = {}
+        self.names = {}
+        for opid, name in opcodes.items():
+            self.ids[name] = opid
+            self.names[opid] = name
+
+        self.next_id = self.first_user_id
+        self.lock = threading.Lock()
+
+    #   --------------------------------
+    #
+    #   Register opcode
+    #
+    #   --------------------------------
+    def register(self, name):
+
+        """
+        Get the ID of an opcode, registering it if needed.
+
+        Parameters
+        ----------
+        name : str
+            Opcode name
+
+        Returns
+        -------
+        int
+            Opcode ID
+        """
+
+        try:
+            return(self.ids[name])
+        except KeyError:
+            pass
+
+        self.lock.acquire()
+        try:
+            if(name not in self.ids):
+                self.ids[name] = self.next_id
+                self.names[self.next_id] = name
+                self.next_id += 1
+            return(self.ids[name])
+        finally:
+            self.lock.release()
+
+    #   --------------------------------
+    #
+    #   Look up an instruction's opcode ID
+    #
+    #   --------------------------------
+    def get_opid(self, instruction):
+
+        """
+        Get the opcode ID of an instruction; works for plain lists (such as
+        frames loaded from file) as well as parsed instructions.
+
+        Parameters
+        ----------
+        instruction : array
+            Instruction to look up
+
+        Returns
+        -------
+        int
+            Opcode ID; UNKNOWN if the opcode is not registered
+        """
+
+        try:
+            return(instruction.opid)
+        except AttributeError:
+            return(self.ids.get(instruction[0], UNKNOWN))
+
+
+# shared registry
+registry = opcode_registry(bin_parser.opcodes)
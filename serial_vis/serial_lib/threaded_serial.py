@@ -3,10 +3,12 @@
 
 import threading
 import time
+from collections import deque
 from .ascii_device import ascii_device
 from .ascii_parser import ascii_parser
 from .bin_device import bin_device
 from .bin_parser import bin_parser
+from .opcode_registry import *
 
 
 class threaded_serial(threading.Thread):
@@ -18,12 +20,27 @@ class threaded_serial(threading.Thread):
     ----------
     exit request : bool
         Serial device requests a system exit
-    instruction_buffer : array
-        Buffer containing recieved instructions
     device_connected : bool
         Tracks whether a device is currently connected
 
     Created by __init__:
+    instruction_buffer : deque
+        Bounded queue containing recieved instructions, as (instruction,
+        stamp) pairs; stamp is (read, parse, enqueue) times, or None if
+        settings.track_latency is False. The size and overflow behavior of
+        the queue are set by settings.queue_size and settings.queue_policy
+    queued_draws : int
+        Number of draw instructions in instruction_buffer, so that the
+        overflow policies only search the queue when it can succeed
+    dropped_instructions : int
+        Number of instructions discarded because the queue was full
+    dropped_frames : int
+        Number of complete frames discarded because the queue was full
+    instruction_count : int
+        Total number of instructions recieved
+    parse_seconds : float
+        Total time spent checking and parsing lines; only counted if
+        settings.track_latency is True
     serial_device : serial device object
         Serial device; either ascii_serial_device or bin_serial_device
     serial_parser : serial parser object
@@ -34,10 +51,11 @@ class threaded_serial(threading.Thread):
         Exits main loop if set to True
     lock : threading.Lock
         Threading lock for accessing the main queue
+    not_full : threading.Condition
+        Signalled when the main queue is drained; used by the "block" policy
     """
 
     exit_request = False
-    instruction_buffer = []
     device_connected = False
 
     #   --------------------------------
@@ -68,8 +86,19 @@ class threaded_serial(threading.Thread):
 
         # thread utility
         self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
         self.done = False
 
+        # instruction queue and overflow counters
+        self.instruction_buffer = deque()
+        self.queued_draws = 0
+        self.dropped_instructions = 0
+        self.dropped_frames = 0
+
+        # throughput counters
+        self.instruction_count = 0
+        self.parse_seconds = 0.0
+
         # create serial device and parser:
         # ascii transmission mode
         # slower, but more human-readable
@@ -131,11 +160,14 @@ class threaded_serial(threading.Thread):
                 # parse instruction
                 instruction = self.serial_parser.process_command(line[0])
 
-                self.lock.acquire()
-                try:
-                    self.instruction_buffer.append(instruction)
-                finally:
-                    self.lock.release()
+                self.instruction_count += 1
+                if(self.settings.track_latency):
+                    self.parse_seconds += (
+                        self.serial_parser.parse_time -
+                        self.serial_device.read_time)
+
+                # add to queue
+                self.enqueue(instruction)
 
                 # exit request passed by the serial device; pass it on
                 if(not line[1]):
@@ -143,6 +175,185 @@ class threaded_serial(threading.Thread):
 
         self.serial_device.close()
 
+    #   --------------------------------
+    #
+    #   Add instruction to the queue
+    #
+    #   --------------------------------
+    def enqueue(self, instruction):
+
+        """
+        Add an instruction to the instruction queue. If the queue already
+        holds settings.queue_size instructions, settings.queue_policy decides
+        what happens:
+
+        "block": wait until the main thread drains the queue.
+        "drop_frame": discard the oldest complete frame in the queue.
+        "drop_instruction": discard incoming instructions other than draw;
+            draw instructions replace the oldest queued non-draw.
+
+        Parameters
+        ----------
+        instruction : mixed array
+            Processed instruction to be queued
+        """
+
+        stamp = None
+
+        self.not_full.acquire()
+        try:
+            if(len(self.instruction_buffer) >= self.settings.queue_size):
+
+                # wait for space; check done periodically so that a
+                # disconnect request can't deadlock the reader
+                if(self.settings.queue_policy == "block"):
+                    while(len(self.instruction_buffer) >=
+                          self.settings.queue_size and not self.done):
+                        self.not_full.wait(0.1)
+
+                # discard a whole frame so that partial frames never reach
+                # the buffer manager
+                elif(self.settings.queue_policy == "drop_frame"):
+                    if(not self.drop_frame()):
+                        instruction = self.drop_instruction(instruction)
+
+                # keep frame boundaries; discard the instruction content
+                else:
+                    instruction = self.drop_instruction(instruction)
+
+            if(instruction is not None):
+                if(self.settings.track_latency):
+                    stamp = (
+                        self.serial_device.read_time,
+                        self.serial_parser.parse_time,
+                        time.time())
+                self.instruction_buffer.append((instruction, stamp))
+                if(registry.get_opid(instruction) == DRAW):
+                    self.queued_draws += 1
+        finally:
+            self.not_full.release()
+
+    #   --------------------------------
+    #
+    #   Queue overflow handling
+    #
+    #   --------------------------------
+    def drop_frame(self):
+
+        """
+        Remove the oldest complete frame from the queue. A complete frame is
+        everything after the first draw instruction, up to and including the
+        second; anything before the first draw belongs to a frame that the
+        buffer manager has already started, and is left alone.
+        Must be called with the lock held.
+
+        Returns
+        -------
+        bool
+            True if a frame was removed; False if the queue does not contain
+            a complete frame.
+        """
+
+        # a complete frame needs two draw instructions
+        if(self.queued_draws < 2):
+            return(False)
+
+        start = -1
+        end = -1
+        for index, entry in enumerate(self.instruction_buffer):
+            if(registry.get_opid(entry[0]) == DRAW):
+                if(start == -1):
+                    start = index
+                else:
+                    end = index
+                    break
+
+        if(end == -1):
+            return(False)
+
+        # rotate the frame to the front of the deque, remove it, and rotate
+        # the preceding partial frame back into place
+        self.instruction_buffer.rotate(-(start + 1))
+        for i in range(end - start):
+            self.instruction_buffer.popleft()
+        self.instruction_buffer.rotate(start + 1)
+
+        self.queued_draws -= 1
+        self.dropped_instructions += end - start
+        self.dropped_frames += 1
+        return(True)
+
+    def drop_instruction(self, instruction):
+
+        """
+        Drop a single instruction from a full queue. Non-draw instructions
+        are discarded outright; draw instructions replace the oldest queued
+        non-draw instruction, so that frame boundaries are preserved. If the
+        queue holds only draw instructions, the oldest one is dropped, which
+        merges two frames.
+        Must be called with the lock held.
+
+        Parameters
+        ----------
+        instruction : mixed array
+            Incoming instruction
+
+        Returns
+        -------
+        mixed array or None
+            Instruction to append, or None if it was discarded.
+        """
+
+        self.dropped_instructions += 1
+
+        if(registry.get_opid(instruction) != DRAW):
+            return(None)
+
+        # the incoming draw is appended by enqueue, and counted there
+        if(self.queued_draws < len(self.instruction_buffer)):
+            for index, entry in enumerate(self.instruction_buffer):
+                if(registry.get_opid(entry[0]) != DRAW):
+                    # rotate the entry to the front, remove it, and rotate
+                    # back
+                    self.instruction_buffer.rotate(-index)
+                    self.instruction_buffer.popleft()
+                    self.instruction_buffer.rotate(index)
+                    return(instruction)
+
+        self.instruction_buffer.popleft()
+        self.queued_draws -= 1
+        self.dropped_frames += 1
+        return(instruction)
+
+    #   --------------------------------
+    #
+    #   Remove all instructions from the queue
+    #
+    #   --------------------------------
+    def get_instructions(self):
+
+        """
+        Remove and return every queued instruction. The lock is only held
+        while the queue is swapped out, so the reader thread is not stalled
+        while the instructions are processed.
+
+        Returns
+        -------
+        deque
+            Queued (instruction, stamp) pairs, oldest first
+        """
+
+        self.not_full.acquire()
+        try:
+            instructions = self.instruction_buffer
+            self.instruction_buffer = deque()
+            self.queued_draws = 0
+            self.not_full.notify_all()
+        finally:
+            self.not_full.release()
+
+        return(instructions)
+
     #   --------------------------------
     #
     #   Check if main thread is alive
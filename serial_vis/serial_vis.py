@@ -2,11 +2,15 @@
 # main class
 
 import pygame
+import threading
+import time
 from . import serial_lib
 from . import graphics_lib
 from . import buffer_lib
 from . import util_lib
 from .sv_command import *
+from .sv_ingest import sv_ingest
+from .serial_lib.opcode_registry import *
 
 
 #   --------------------------------
@@ -31,28 +35,52 @@ class serial_vis(sv_command):
     command_mode : bool
         Whether the program is currently in command mode or normal input mode
         All key inputs are directed to the command line in command mode.
-    connect_device : bool
-        Is set to False if no device is connected, and no device connection
-        attempts should be made.
+    user_routes : dict
+        Name of the serial_vis method handling each opcode, keyed by opcode
+        name; overrides the default routes. Handlers are called with
+        (device_name, instruction, stamp, dequeue_time).
 
     Created by __init__:
+    connect_device : dict
+        Whether each device is connected, keyed by device name. "main" is
+        False if no device connection attempts should be made.
     serial_device : threaded serial device object
         Combines a serial device and parser into a secondary thread.
     csv_log : csv_log object
-        CSV log object
+        CSV log object; None if settings.log_format is "column"
+    column_log : column_log object
+        Columnar log object; None if settings.log_format is "csv"
+    log_sinks : array
+        Log objects that log instructions are sent to
     error_handler : error handler object
         Hosts centralized error handling
     graphics_window : graphics_class
         Vector graphics class to be used
     buffer_db : buffer_db object
         Frame buffer storage and tracking
+    ingest_lock : threading.Lock
+        Guards the buffer manager and device registry between the render
+        loop and the ingest thread
+    ingest_thread : sv_ingest object
+        Services devices independently of rendering; None if
+        settings.threaded_ingest is False
+    quit_request : bool
+        Set when a device disconnect should quit serial vis
+    stats_time : float
+        Time that statistics were last collected
+    stats_counters : dict
+        Device counters at the last collection, keyed by device name
+    stats_log_records : int
+        Number of log rows written at the last collection
+    routes : dict
+        Handler for each opcode, keyed by opcode ID; built by build_routes
     """
 
     user_settings = {}
     user_commands = {}
+    user_routes = {}
     graphics_class = graphics_lib.default_vector_graphics
     command_mode = False
-    connect_device = {"main": True}
 
     #   --------------------------------
     #
@@ -74,25 +102,33 @@ class serial_vis(sv_command):
 
         # update settings
         self.settings = {"main": util_lib.sv_settings()}
+        self.user_settings = dict(self.user_settings)
         self.user_settings.update(kwargs)
         self.settings["main"].update(self.user_settings)
 
         # set up centralized error handling
         self.error_handler = util_lib.error_handler(self.settings["main"])
 
-        # create log
-        self.csv_log = util_lib.csv_log(self.settings["main"])
+        # create logs
+        self.csv_log = None
+        self.column_log = None
+        if(self.settings["main"].log_format in ["csv", "both"]):
+            self.csv_log = util_lib.csv_log(self.settings["main"])
+        if(self.settings["main"].log_format in ["column", "both"]):
+            self.column_log = util_lib.column_log(self.settings["main"])
+        self.log_sinks = [
+            log for log in [self.csv_log, self.column_log] if log is not None]
 
         # disable device connection if a blank path is specified.
-        if(self.settings["main"].path == ""):
-            self.connect_device["main"] = False
+        self.connect_device = {"main": self.settings["main"].path != ""}
 
         # create threaded serial handler for the main instance
+        self.serial_device = {}
         if(self.connect_device["main"]):
-            self.serial_device = {"main": serial_lib.threaded_serial(
+            self.serial_device["main"] = serial_lib.threaded_serial(
                 self.settings["main"],
                 self.error_handler,
-                self.user_commands)}
+                self.user_commands)
             self.serial_device["main"].start()
 
         # create graphics window using main settings
@@ -103,6 +139,22 @@ class serial_vis(sv_command):
         self.buffer_manager = buffer_lib.buffer_manager(
             self.settings, self.error_handler)
 
+        # instruction routing table
+        self.routes = self.build_routes()
+
+        # statistics
+        self.stats_time = time.time()
+        self.stats_counters = {}
+        self.stats_log_records = 0
+
+        # start ingest thread
+        self.quit_request = False
+        self.ingest_lock = threading.Lock()
+        self.ingest_thread = None
+        if(self.settings["main"].threaded_ingest):
+            self.ingest_thread = sv_ingest(self, self.ingest_lock)
+            self.ingest_thread.start()
+
     #   --------------------------------
     #
     #   execute program update
@@ -114,34 +166,71 @@ class serial_vis(sv_command):
         Execute master program update.
         """
 
-        # process keyboard/mouse commands
-        if(self.command_mode):
-            line = self.command_line.update()
-            if(line[0]):
-                self.command_mode = False
-                self.process_command(line[1])
-            command_line = self.command_line.get_text_object()
-        else:
-            command_line = pygame.Surface((0, 0))
-            self.process_events(self.graphics_window.check_events())
-
-        # fetch serial device output for each device if enabled
-        for device, enabled in self.connect_device.items():
-            if(enabled):
-                self.service_device(device)
-
-        buffers_to_draw = {}
-        # update graphics for each device
-        for device in self.connect_device:
-            if(self.connect_device[device]):
-                buffers_to_draw.update({
-                    device: self.buffer_manager.get_buffer(device)})
-        # update buffer
+        # acquire ingest lock --------------------------------------------
+        self.ingest_lock.acquire()
+        try:
+            # process keyboard/mouse commands
+            if(self.command_mode):
+                line = self.command_line.update()
+                if(line[0]):
+                    self.command_mode = False
+                    self.process_command(line[1])
+                command_line = self.command_line.get_text_object()
+            else:
+                command_line = pygame.Surface((0, 0))
+                self.process_events(self.graphics_window.check_events())
+
+            # fetch serial device output, unless the ingest thread does
+            if(self.ingest_thread is None):
+                self.service_devices()
+
+            # move new logf samples into the plot buffers
+            self.graphics_window.flush_plots()
+
+            buffers_to_draw = {}
+            # update graphics for each device
+            for device in self.connect_device:
+                if(self.connect_device[device]):
+                    buffers_to_draw.update({
+                        device: self.buffer_manager.get_buffer(device)})
+
+            # refresh statistics overlay
+            if(self.settings["main"].show_stats and
+               time.time() > (self.stats_time +
+                              self.settings["main"].stats_interval)):
+                self.graphics_window.stats_lines = self.format_stats(
+                    self.get_stats())
+        finally:
+            self.ingest_lock.release()
+        # release lock ---------------------------------------------------
+
+        # quit if requested by a device disconnect or the quit command
+        if(self.quit_request):
+            self.quit_sv()
+
+        # update buffer; completed frames are not modified by ingest, so
+        # they can be drawn without holding the lock
         self.graphics_window.update_screen(
             buffers_to_draw,
             self.command_mode,
             command_line)
 
+    #   --------------------------------
+    #
+    #   service all serial devices
+    #
+    #   --------------------------------
+    def service_devices(self):
+
+        """
+        Service every connected device. Called by the ingest thread, or by
+        update if settings.threaded_ingest is False.
+        """
+
+        for device, enabled in list(self.connect_device.items()):
+            if(enabled):
+                self.service_device(device)
+
     #   --------------------------------
     #
     #   service serial device
@@ -153,43 +242,297 @@ class serial_vis(sv_command):
         Service the serial device thread
         """
 
-        # check for exit request
+        # check for exit request; quitting is left to the main thread
         if(self.serial_device[device_name].exit_request):
             if(self.settings[device_name].quit_on_disconnect):
-                self.quit_sv()
+                self.quit_request = True
             else:
                 self.connect_device[device_name] = False
                 self.serial_device[device_name].done = True
 
-        # acquire thread lock ---------------------------------------------
-        self.serial_device[device_name].lock.acquire()
+        # fetch all queued instructions
+        instructions = self.serial_device[device_name].get_instructions()
+        dequeue_time = time.time()
+        fps_opid = registry.register(
+            self.settings[device_name].fps_count_keyword)
 
-        # fetch instruction if it exists
-        while(len(self.serial_device[device_name].instruction_buffer) > 0):
-            instruction = self.serial_device[device_name].\
-                instruction_buffer.pop(0)
+        routes = self.routes
+        route_frame = self.route_frame
 
-            # log command with window fps tracker
-            self.graphics_window.update_fps(instruction, device_name)
+        # compiled trigger conditions; skipped entirely if there are none
+        triggers = self.buffer_manager.get_triggers(device_name)
+        check_triggers = not triggers.is_empty()
 
-            # log instructions
-            if(instruction[0] in ["logs", "logf", "logstart", "logend"]):
-                self.csv_log.log_data(instruction)
+        for instruction, stamp in instructions:
 
-            # print instruction
-            elif(instruction[0] == "echo"):
-                print(instruction[1])
+            # opcode ID assigned by the parser
+            try:
+                opid = instruction.opid
+            except AttributeError:
+                opid = registry.get_opid(instruction)
 
-            # null instruction
-            elif(instruction[0] == "null" or len(instruction) == 0):
-                pass
+            # log command with window fps tracker, timed by when it was read
+            if(opid == fps_opid):
+                self.graphics_window.update_fps(
+                    instruction, device_name,
+                    stamp[0] if stamp is not None else dequeue_time)
 
-            # process draw-related instructions
-            else:
-                self.buffer_manager.update(device_name, instruction)
+            if(check_triggers and triggers.test(instruction, opid)):
+                self.buffer_manager.start_capture(device_name)
+
+            # unregistered opcodes are treated as draw-related
+            routes.get(opid, route_frame)(
+                device_name, instruction, stamp, dequeue_time)
+
+    #   --------------------------------
+    #
+    #   instruction routing
+    #
+    #   --------------------------------
+    def build_routes(self):
+
+        """
+        Build the opcode routing table used by service_device. Every
+        registered opcode is routed to the frame builder, except log, echo
+        and null instructions; user_routes are applied last.
+
+        Returns
+        -------
+        dict
+            Handler for each opcode, keyed by opcode ID
+        """
+
+        routes = {}
+        for opcode in (list(serial_lib.ascii_parser.commands) +
+                       list(self.user_commands)):
+            routes[registry.register(opcode)] = self.route_frame
+
+        for opid in [LOGS, LOGSTART, LOGEND]:
+            routes[opid] = self.route_log
+        routes[LOGF] = self.route_logf
+        routes[ECHO] = self.route_echo
+        routes[NULL] = self.route_null
+
+        for opcode, handler in self.user_routes.items():
+            routes[registry.register(opcode)] = getattr(self, handler)
+
+        return(routes)
+
+    def route_frame(self, device_name, instruction, stamp, dequeue_time):
+
+        """
+        Process draw-related instructions
+        """
+
+        frame = self.buffer_manager.update(
+            device_name, instruction, stamp, dequeue_time)
+
+        # eager ingest: prepare every frame as it is completed,
+        # instead of only the frames that are displayed
+        if(frame is not None and
+           self.settings[device_name].ingest_mode == "eager"):
+            self.graphics_window.prepare_frame(frame)
+
+    def route_log(self, device_name, instruction, stamp, dequeue_time):
+
+        """
+        Log instructions
+        """
+
+        for log in self.log_sinks:
+            log.log_data(instruction)
 
-        self.serial_device[device_name].lock.release()
-        # release lock ----------------------------------------------------
+    def route_logf(self, device_name, instruction, stamp, dequeue_time):
+
+        """
+        Log and plot logf instructions
+        """
+
+        for log in self.log_sinks:
+            log.log_data(instruction)
+        self.graphics_window.update_plot(instruction)
+
+    def route_echo(self, device_name, instruction, stamp, dequeue_time):
+
+        """
+        Print instruction
+        """
+
+        print(instruction[1])
+
+    def route_null(self, device_name, instruction, stamp, dequeue_time):
+
+        """
+        Null instruction
+        """
+
+        pass
+
+    #   --------------------------------
+    #
+    #   get latency statistics
+    #
+    #   --------------------------------
+    def get_latency(self, device_name="main"):
+
+        """
+        Get serial-to-screen latency statistics for a device.
+
+        Parameters
+        ----------
+        device_name : str
+            Device to get statistics for
+
+        Returns
+        -------
+        dict
+            (p50, p99) latency in seconds, keyed by pipeline stage; see
+            util_lib.latency_stats. Empty if no frames have been displayed.
+        """
+
+        return(self.graphics_window.compute_latency(device_name))
+
+    #   --------------------------------
+    #
+    #   get performance statistics
+    #
+    #   --------------------------------
+    def get_stats(self):
+
+        """
+        Collect performance statistics. Rates are averaged over the time
+        since the previous call; all counters are maintained incrementally,
+        so this is cheap to call periodically.
+
+        Returns
+        -------
+        dict
+            "devices": dict of statistics for each device, keyed by name
+            "caches": hit rate of each graphics cache, keyed by cache name
+            "log records/s": rows written to the csv log per second
+        """
+
+        current_time = time.time()
+        elapsed = max(current_time - self.stats_time, 1e-6)
+        self.stats_time = current_time
+
+        devices = {}
+        for device, serial_device in list(self.serial_device.items()):
+
+            counters = (
+                serial_device.instruction_count,
+                serial_device.serial_device.bytes_read,
+                serial_device.parse_seconds,
+                # only the ascii parser has a parse cache
+                getattr(serial_device.serial_parser, "cache_hits", 0),
+                getattr(serial_device.serial_parser, "cache_misses", 0))
+            previous = self.stats_counters.get(device, counters)
+            self.stats_counters[device] = counters
+
+            instructions = counters[0] - previous[0]
+            parse_time = 0
+            if(instructions > 0):
+                parse_time = (counters[2] - previous[2]) / instructions
+
+            lookups = (
+                counters[3] - previous[3] + counters[4] - previous[4])
+            cache_rate = 0
+            if(lookups > 0):
+                cache_rate = float(counters[3] - previous[3]) / lookups
+
+            history = self.buffer_manager.get_history_info(device)
+
+            devices[device] = {
+                "instructions/s": instructions / elapsed,
+                "bytes/s": (counters[1] - previous[1]) / elapsed,
+                "parse time": parse_time,
+                "parse cache": cache_rate,
+                "queue depth": len(serial_device.instruction_buffer),
+                "dropped instructions": serial_device.dropped_instructions,
+                "dropped frames": serial_device.dropped_frames,
+                "history frames": history[0],
+                "history bytes": history[1],
+                "render times": dict(
+                    self.graphics_window.render_times.get(device, {})),
+                "latency": self.get_latency(device),
+                "fps": self.graphics_window.compute_fps(device),
+                "frame interval": self.graphics_window.compute_jitter(
+                    device)}
+
+        caches = {}
+        for name, (hits, misses) in self.graphics_window.cache_stats.items():
+            if(hits + misses > 0):
+                caches[name] = float(hits) / (hits + misses)
+
+        log_records = sum(log.records_written for log in self.log_sinks)
+        log_rate = (log_records - self.stats_log_records) / elapsed
+        self.stats_log_records = log_records
+
+        return({
+            "devices": devices,
+            "caches": caches,
+            "log records/s": log_rate})
+
+    def format_stats(self, stats):
+
+        """
+        Format statistics from get_stats as lines of text.
+
+        Parameters
+        ----------
+        stats : dict
+            Output of get_stats
+
+        Returns
+        -------
+        str[]
+            Lines of text
+        """
+
+        lines = []
+        for device, info in stats["devices"].items():
+            lines.append(
+                device + ": " +
+                str(int(info["instructions/s"])) + " instr/s  " +
+                str(int(info["bytes/s"])) + " B/s  parse " +
+                str(round(info["parse time"] * 1e6, 1)) + " us/line (" +
+                str(round(info["parse cache"] * 100, 1)) + "% cached)" +
+                "  queue " + str(info["queue depth"]) + "  dropped " +
+                str(info["dropped instructions"]) + " instr/" +
+                str(info["dropped frames"]) + " frames  history " +
+                str(info["history frames"]) + " frames/" +
+                str(round(info["history bytes"] / 1e6, 2)) + " MB")
+
+            # render time of the last sampled frame, slowest opcode first
+            render_times = sorted(
+                info["render times"].items(), key=lambda x: -x[1])
+            if(len(render_times) > 0):
+                lines.append(
+                    "  render ms/frame: " + " ".join(
+                        opcode + " " + str(round(seconds * 1000, 2))
+                        for opcode, seconds in render_times))
+
+            lines.append(
+                "  fps " + str(round(info["fps"], 2)) +
+                "  frame interval ms mean/std/max: " + "/".join(
+                    str(round(seconds * 1000, 2))
+                    for seconds in info["frame interval"]))
+
+            if("total" in info["latency"]):
+                lines.append(
+                    "  latency ms p50/p99: " +
+                    str(round(info["latency"]["total"][0] * 1000, 1)) + "/" +
+                    str(round(info["latency"]["total"][1] * 1000, 1)))
+
+        lines.append(
+            "log: " + str(int(stats["log records/s"])) + " records/s")
+
+        if(len(stats["caches"]) > 0):
+            lines.append("cache hit rate: " + " ".join(
+                name + " " + str(round(rate * 100, 1)) + "%"
+                for name, rate in stats["caches"].items()))
+
+        return(lines)
 
     #   --------------------------------
     #
@@ -199,17 +542,26 @@ class serial_vis(sv_command):
     def quit_sv(self):
 
         """
-        Cleanly quit all sub-objects.
+        Cleanly quit all sub-objects. Must be called without the ingest
+        lock held, since it waits for the ingest thread to exit.
         """
 
         # print message
 
         print("\nClosing serial-vis ... \n")
 
+        # stop the ingest thread before closing the sinks it writes to
+        if(self.ingest_thread is not None):
+            self.ingest_thread.done = True
+            self.ingest_thread.join()
+
         # call clean close methods
+        self.buffer_manager.close()
         self.graphics_window.close_window()
-        self.csv_log.close_file()
-        self.serial_device["main"].done = True
+        for log in self.log_sinks:
+            log.close_file()
+        for device in self.serial_device.values():
+            device.done = True
 
         exit()
 
@@ -1,6 +1,7 @@
 # sv_command.py
 # centralized command handling
 
+import math
 from . import serial_lib
 from . import graphics_lib
 from . import util_lib
@@ -70,6 +71,39 @@ class sv_command:
             except AttributeError:
                 self._ELSE(event, "??")
 
+    #   --------------------------------
+    #
+    #   get command targets
+    #
+    #   --------------------------------
+    def get_targets(self, device):
+
+        """
+        Get the devices that a command applies to.
+
+        Parameters
+        ----------
+        device : str
+            Device name; if blank, every connected device
+
+        Returns
+        -------
+        str[]
+            Names of the devices; empty if no device is registered under
+            the given name
+        """
+
+        if(device == ""):
+            return([
+                name for name in self.connect_device
+                if self.connect_device[name]])
+
+        if(device not in self.connect_device):
+            self.error_handler.raise_error("dnf", [], device)
+            return([])
+
+        return([device])
+
     #   --------------------------------
     #
     #   Command line commands
@@ -86,10 +120,11 @@ class sv_command:
     def _quit(self, arguments, command):
 
         """
-        Quit serial vis cleanly
+        Quit serial vis cleanly; deferred to update, after the ingest lock
+        is released
         """
 
-        self.quit_sv()
+        self.quit_request = True
 
     def _cmd(self, arguments, command):
 
@@ -213,18 +248,129 @@ class sv_command:
     def _pause(self, arguments, command):
 
         """
-        Toggle live mode
+        Toggle live mode of a device (default: every connected device)
         """
 
-        # toggle live mode for each connected device
-        for device in self.connect_device:
-            if(self.connect_device[device]):
-                self.buffer_manager.change_buffer(0, device)
+        device = arguments[1] if len(arguments) > 1 else ""
+        for target in self.get_targets(device):
+            self.buffer_manager.change_buffer(0, target)
 
     def _view(self, arguments, command):
 
         """
-        Change the current buffer
+        Change the current buffer of a device (default: every connected
+        device)
+        """
+
+        try:
+            index = int(float(arguments[1]))
+        except ValueError:
+            self.error_handler.raise_error("stx", [], command)
+            return
+
+        device = arguments[2] if len(arguments) > 2 else ""
+        for target in self.get_targets(device):
+            self.buffer_manager.change_buffer(index, target)
+
+    def _zoom(self, arguments, command):
+
+        """
+        Zoom the view by a factor, about a screen position (default: the
+        center of the window); the factor must be positive, and all
+        values finite
+        """
+
+        main = self.settings["main"]
+
+        try:
+            factor = float(arguments[1])
+            if(arguments[2] != "" and arguments[3] != ""):
+                center = (float(arguments[2]), float(arguments[3]))
+            else:
+                center = (main.window_size[0] / 2, main.window_size[1] / 2)
+        except ValueError:
+            self.error_handler.raise_error("stx", [], command)
+            return
+
+        # non-finite values would break the view transform
+        if(not (math.isfinite(factor) and factor > 0 and
+                math.isfinite(center[0]) and math.isfinite(center[1]))):
+            self.error_handler.raise_error("stx", [], command)
+            return
+
+        # limit the zoom to settings.zoom_min ... settings.zoom_max
+        zoom = min(max(main.view_zoom * factor, main.zoom_min), main.zoom_max)
+        if(main.view_zoom > 0):
+            factor = zoom / main.view_zoom
+
+        # keep the point under the center fixed
+        main.view_pan = (
+            center[0] - (center[0] - main.view_pan[0]) * factor,
+            center[1] - (center[1] - main.view_pan[1]) * factor)
+        main.view_zoom = zoom
+
+    def _pan(self, arguments, command):
+
+        """
+        Pan the view by a number of pixels
+        """
+
+        try:
+            shift = (float(arguments[1]), float(arguments[2]))
+        except ValueError:
+            self.error_handler.raise_error("stx", [], command)
+            return
+
+        if(not (math.isfinite(shift[0]) and math.isfinite(shift[1]))):
+            self.error_handler.raise_error("stx", [], command)
+            return
+
+        self.settings["main"].view_pan = (
+            self.settings["main"].view_pan[0] + shift[0],
+            self.settings["main"].view_pan[1] + shift[1])
+
+    def _resetview(self, arguments, command):
+
+        """
+        Reset the view zoom and pan
+        """
+
+        self.settings["main"].view_zoom = 1.0
+        self.settings["main"].view_pan = (0, 0)
+
+    def _stats(self, arguments, command):
+
+        """
+        Print performance statistics; "stats overlay" toggles the
+        on-screen statistics overlay instead
         """
 
-        self.buffer_manager.change_buffer(int(float(arguments[1])), "main")
+        if(arguments[1] == "overlay"):
+            self.settings["main"].show_stats = (
+                not self.settings["main"].show_stats)
+        else:
+            for line in self.format_stats(self.get_stats()):
+                print(line)
+
+    def _plot(self, arguments, command):
+
+        """
+        Toggle the plot of a logf label; with no label, list the labels
+        that can be plotted
+        """
+
+        if(not graphics_lib.plot_buffer.enabled):
+            self.error_handler.raise_error("nnp", [], arguments[1])
+            return
+
+        labels = list(self.settings["main"].plot_labels)
+
+        if(arguments[1] == ""):
+            for label in sorted(self.graphics_window.plot_seen):
+                print(("* " if label in labels else "  ") + label)
+        elif(arguments[1] in labels):
+            labels.remove(arguments[1])
+        else:
+            labels.append(arguments[1])
+
+        self.settings["main"].plot_labels = labels
@@ -0,0 +1,91 @@
+# sv_ingest.py
+# asynchronous ingest; drains device queues into the buffer manager
+
+import threading
+import time
+
+
+#   --------------------------------
+#
+#   Ingest thread
+#
+#   --------------------------------
+class sv_ingest(threading.Thread):
+
+    """
+    Ingest thread; services every connected device at settings.ingest_rate,
+    independently of the render loop in serial_vis.update.
+
+    Attributes
+    ----------
+    Created by __init__:
+    owner : serial_vis object
+        serial_vis instance whose devices are serviced
+    lock : threading.Lock
+        Lock guarding the buffer manager and device registry; shared with
+        the render loop
+    done : bool
+        Exits main loop if set to True
+    """
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, owner, lock):
+
+        """
+        Create an ingest thread
+
+        Parameters
+        ----------
+        owner : serial_vis object
+            serial_vis instance to service
+        lock : threading.Lock
+            Lock shared with the render loop
+        """
+
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.owner = owner
+        self.lock = lock
+        self.done = False
+
+    #   --------------------------------
+    #
+    #   Run thread (called by threading module)
+    #
+    #   --------------------------------
+    def run(self):
+
+        """
+        Service all devices until done is set or the main thread exits.
+        """
+
+        while(not self.done and threading.main_thread().is_alive()):
+
+            start_time = time.time()
+
+            self.lock.acquire()
+            try:
+                # done may have been set while waiting for the lock
+                if(self.done):
+                    break
+                self.owner.service_devices()
+
+            # report errors and keep servicing; an uncaught exception would
+            # silently stop ingest for every device
+            except Exception as error:
+                self.owner.error_handler.raise_error(
+                    "unk", [], type(error).__name__ + ": " + str(error))
+            finally:
+                self.lock.release()
+
+            # sleep for the remainder of the period
+            rate = self.owner.settings["main"].ingest_rate
+            if(rate > 0):
+                remaining = start_time + 1.0 / rate - time.time()
+                if(remaining > 0):
+                    time.sleep(remaining)
@@ -1,14 +1,20 @@
 # util_lib members
 # all classes exposed, since any can be reused
 __all__ = [
+    "column_log",
     "csv_log",
     "error_handler",
+    "latency_stats",
+    "rate_estimator",
     "sv_settings",
     "t_color"
 ]
 
 # imports to provide a friendly namespace
+from .column_log import column_log
 from .csv_log import csv_log
 from .error_handler import error_handler
+from .latency_stats import latency_stats
+from .rate_estimator import rate_estimator
 from .sv_settings import sv_settings
 from .t_color import color
@@ -0,0 +1,528 @@
+# column_log.py
+# label-indexed columnar binary log, with conversion back to csv
+
+import array
+import csv
+import math
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from ..serial_lib.opcode_registry import *
+
+
+#   --------------------------------
+#
+#   File format
+#
+#   --------------------------------
+
+# header: magic, version, byte order of float columns ("<" or ">")
+# chunk:  "C", row count (u32), new label count (u16),
+#         new labels: id (u16), type ("f"/"s"), name length (u16), name
+#         timestamp column: row count float64
+#         column count (u16)
+#         columns: id (u16), data length (u32), data
+#             "f": row count float64, NaN if missing
+#             "s": per row, length (u32) and utf-8 bytes; 0xFFFFFFFF if
+#                  missing
+MAGIC = b"SVCL"
+VERSION = 1
+MISSING = 0xFFFFFFFF
+
+
+#   --------------------------------
+#
+#   Columnar logging class
+#
+#   --------------------------------
+
+class column_log:
+
+    """
+    Columnar logging class. Each label gets a typed column (float for logf,
+    string for logs), and rows share a timestamp column. A log block
+    (logstart ... logend) is one row; a value logged outside a block is a
+    row of its own. Rows are written in chunks of settings.column_chunk_size
+    by a background thread.
+
+    Attributes
+    ----------
+
+    Created by __init__:
+    labels : dict
+        Column index of each label, keyed by label; includes the labels
+        of earlier sessions when appending to an existing file
+    label_types : str[]
+        Type of each column, "f" or "s", in column index order
+    new_labels : int[]
+        Columns created since the last chunk was written
+    timestamps : array
+        Timestamp of each row in the current chunk
+    columns : dict
+        Values of each column in the current chunk, keyed by column index;
+        may be shorter than timestamps if the latest rows are missing values
+    block_time : float
+        Start time of the current log block; -1 if no block is in progress
+    block_row : int
+        Row index used by the current log block; -1 if none yet
+    records_written : int
+        Number of values written to file
+    chunks : queue.Queue
+        Chunks waiting for the writer thread; None marks the end
+    """
+
+    #   --------------------------------
+    #
+    #   initialization
+    #
+    #   --------------------------------
+    def __init__(self, settings):
+
+        """
+        Create columnar log file
+
+        Parameters
+        ----------
+        settings : sv_settings object
+            Object containing program settings
+        """
+
+        self.settings = settings
+
+        self.labels = {}
+        self.label_types = []
+        self.new_labels = []
+
+        self.timestamps = array.array("d")
+        self.columns = {}
+        self.block_time = -1
+        self.block_row = -1
+        self.values = 0
+        self.records_written = 0
+
+        # appending to an existing log: continue its column indices, so
+        # that labels keep one index across sessions
+        name = self.settings.column_log_name
+        if(os.path.isfile(name) and os.path.getsize(name) > 0):
+            self.load_labels(name)
+
+        # open output file; write the header if the file is new
+        self.log_output_file = open(name, "ab")
+        if(self.log_output_file.tell() == 0):
+            self.log_output_file.write(
+                MAGIC + struct.pack("<B", VERSION) +
+                (b"<" if sys.byteorder == "little" else b">"))
+
+        # start writer thread
+        self.chunks = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop)
+        self.writer.daemon = True
+        self.writer.start()
+
+    def load_labels(self, path):
+
+        """
+        Load the labels of an existing log file.
+
+        Parameters
+        ----------
+        path : str
+            Columnar log file being appended to
+        """
+
+        for new_labels, timestamps, columns in read_chunks(path, True):
+            for index, column_type, label in new_labels:
+                self.labels[label] = index
+                while(len(self.label_types) <= index):
+                    self.label_types.append(column_type)
+                self.label_types[index] = column_type
+
+    #   --------------------------------
+    #
+    #   clean exit
+    #
+    #   --------------------------------
+    def close_file(self):
+
+        """
+        Cleanly exit; write the last chunk and close the log file
+        """
+
+        self.end_chunk()
+        self.chunks.put(None)
+        self.writer.join()
+        self.log_output_file.close()
+
+    #   --------------------------------
+    #
+    #   log data
+    #
+    #   --------------------------------
+    def log_data(self, instruction):
+
+        """
+        Log one instruction line
+
+        Parameters
+        ----------
+        instruction : mixed array
+            instruction to be logged
+        """
+
+        opid = registry.get_opid(instruction)
+
+        # logstart opcode: start a log block
+        if(opid == LOGSTART):
+            self.block_time = time.time()
+            self.block_row = -1
+
+        # logend opcode: end the log block
+        elif(opid == LOGEND):
+            self.block_time = -1
+
+        else:
+            column_type = "f" if opid == LOGF else "s"
+            column = self.get_column(instruction[1], column_type)
+
+            # a value outside a block, or a label repeated within a block,
+            # starts a new row
+            if(self.block_time != -1 and self.block_row != -1 and
+               len(column) <= self.block_row):
+                row = self.block_row
+            else:
+                if(len(self.timestamps) >= self.settings.column_chunk_size):
+                    self.end_chunk()
+                    column = self.get_column(instruction[1], column_type)
+
+                if(self.block_time == -1):
+                    row = self.new_row(time.time())
+                else:
+                    row = self.new_row(self.block_time)
+                    self.block_row = row
+
+            self.set_value(column, row, instruction[2])
+
+    #   --------------------------------
+    #
+    #   column and row management
+    #
+    #   --------------------------------
+    def get_column(self, label, column_type):
+
+        """
+        Get the column for a label, creating it if needed.
+
+        Parameters
+        ----------
+        label : str
+            Label to look up
+        column_type : str
+            "f" or "s"; only used if the column is created
+
+        Returns
+        -------
+        array or list
+            Values of the column in the current chunk
+        """
+
+        index = self.labels.get(label)
+        if(index is None):
+            index = len(self.label_types)
+            self.labels[label] = index
+            self.label_types.append(column_type)
+            self.new_labels.append(index)
+
+        column = self.columns.get(index)
+        if(column is None):
+            if(self.label_types[index] == "f"):
+                column = array.array("d")
+            else:
+                column = []
+            self.columns[index] = column
+
+        return(column)
+
+    def new_row(self, timestamp):
+
+        """
+        Start a new row in the current chunk.
+
+        Returns
+        -------
+        int
+            Index of the new row
+        """
+
+        self.timestamps.append(timestamp)
+        return(len(self.timestamps) - 1)
+
+    def set_value(self, column, row, value):
+
+        """
+        Set a column's value in a row, padding skipped rows as missing.
+        """
+
+        if(type(column) == array.array):
+            pad = float("nan")
+            try:
+                value = float(value)
+            except ValueError:
+                value = pad
+        else:
+            pad = None
+            value = str(value)
+
+        while(len(column) < row):
+            column.append(pad)
+        column.append(value)
+        self.values += 1
+
+    def end_chunk(self):
+
+        """
+        Hand the current chunk to the writer thread, and start a new one.
+        """
+
+        # rows of the current block are in the handed off chunk
+        self.block_row = -1
+
+        if(len(self.timestamps) == 0):
+            return
+
+        new_labels = [
+            (index, self.label_types[index], label)
+            for label, index in self.labels.items()
+            if index in self.new_labels]
+
+        self.chunks.put(
+            (new_labels, self.timestamps, self.columns, self.values))
+
+        self.new_labels = []
+        self.timestamps = array.array("d")
+        self.columns = {}
+        self.values = 0
+
+    #   --------------------------------
+    #
+    #   writer thread
+    #
+    #   --------------------------------
+    def write_loop(self):
+
+        """
+        Encode and write chunks until the end marker is received.
+        """
+
+        while(True):
+            chunk = self.chunks.get()
+            if(chunk is None):
+                break
+
+            self.log_output_file.write(encode_chunk(*chunk[:3]))
+            self.log_output_file.flush()
+            self.records_written += chunk[3]
+
+
+#   --------------------------------
+#
+#   Chunk encoding
+#
+#   --------------------------------
+def encode_chunk(new_labels, timestamps, columns):
+
+    """
+    Encode one chunk.
+
+    Parameters
+    ----------
+    new_labels : array
+        (column index, type, label) of columns first used in this chunk
+    timestamps : array
+        Timestamp of each row
+    columns : dict
+        Values of each column, keyed by column index
+
+    Returns
+    -------
+    bytes
+        Encoded chunk
+    """
+
+    rows = len(timestamps)
+    output = [b"C", struct.pack("<IH", rows, len(new_labels))]
+
+    for index, column_type, label in new_labels:
+        name = label.encode("utf-8")
+        output.append(
+            struct.pack("<Hc", index, column_type.encode("ascii")) +
+            struct.pack("<H", len(name)) + name)
+
+    output.append(timestamps.tobytes())
+    output.append(struct.pack("<H", len(columns)))
+
+    for index, column in columns.items():
+        if(type(column) == array.array):
+            # pad missing values at the end of the chunk
+            if(len(column) < rows):
+                column.extend([float("nan")] * (rows - len(column)))
+            data = column.tobytes()
+        else:
+            column.extend([None] * (rows - len(column)))
+            parts = []
+            for value in column:
+                if(value is None):
+                    parts.append(struct.pack("<I", MISSING))
+                else:
+                    value = value.encode("utf-8")
+                    parts.append(struct.pack("<I", len(value)) + value)
+            data = b"".join(parts)
+
+        output.append(struct.pack("<HI", index, len(data)) + data)
+
+    return(b"".join(output))
+
+
+#   --------------------------------
+#
+#   Reading
+#
+#   --------------------------------
+def read_chunks(path, skip_data=False):
+
+    """
+    Read the chunks of a columnar log file.
+
+    Parameters
+    ----------
+    path : str
+        File to read
+    skip_data : bool
+        If True, only read label definitions; timestamps and columns are
+        skipped and returned as None
+
+    Yields
+    ------
+    (array, array, dict)
+        New labels as (column index, type, label), timestamps, and the
+        values of each column in the chunk keyed by column index; missing
+        values are NaN (float columns) or None (string columns)
+    """
+
+    with open(path, "rb") as infile:
+
+        header = infile.read(6)
+        if(header[:4] != MAGIC):
+            raise ValueError(path + " is not a serial-vis column log")
+        swap = (header[5:6] == b"<") != (sys.byteorder == "little")
+
+        label_types = {}
+        while(True):
+            marker = infile.read(1)
+            if(marker != b"C"):
+                break
+
+            rows, label_count = struct.unpack("<IH", infile.read(6))
+            new_labels = []
+            for i in range(label_count):
+                index, column_type = struct.unpack("<Hc", infile.read(3))
+                length = struct.unpack("<H", infile.read(2))[0]
+                label = infile.read(length).decode("utf-8")
+                column_type = column_type.decode("ascii")
+                label_types[index] = column_type
+                new_labels.append((index, column_type, label))
+
+            if(skip_data):
+                infile.seek(8 * rows, 1)
+                timestamps = None
+            else:
+                timestamps = array.array("d")
+                timestamps.frombytes(infile.read(8 * rows))
+                if(swap):
+                    timestamps.byteswap()
+
+            columns = {}
+            column_count = struct.unpack("<H", infile.read(2))[0]
+            for i in range(column_count):
+                index, length = struct.unpack("<HI", infile.read(6))
+                if(skip_data):
+                    infile.seek(length, 1)
+                    continue
+                data = infile.read(length)
+                if(label_types[index] == "f"):
+                    column = array.array("d")
+                    column.frombytes(data)
+                    if(swap):
+                        column.byteswap()
+                else:
+                    column = []
+                    offset = 0
+                    while(offset < length):
+                        size = struct.unpack_from("<I", data, offset)[0]
+                        offset += 4
+                        if(size == MISSING):
+                            column.append(None)
+                        else:
+                            column.append(
+                                data[offset:offset + size].decode("utf-8"))
+                            offset += size
+                columns[index] = column
+
+            yield((new_labels, None if skip_data else timestamps,
+                   None if skip_data else columns))
+
+
+def to_csv(path, csv_path):
+
+    """
+    Convert a columnar log file to a csv file with a "time" column followed
+    by one column per label, in first-seen order. Missing values are left
+    empty.
+
+    Parameters
+    ----------
+    path : str
+        Columnar log file to read
+    csv_path : str
+        csv file to write
+    """
+
+    # first pass: collect the labels
+    labels = []
+    for new_labels, timestamps, columns in read_chunks(path, skip_data=True):
+        labels += new_labels
+    labels.sort()
+
+    with open(csv_path, "w", newline="") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["time"] + [label for i, t, label in labels])
+
+        # second pass: write rows chunk by chunk
+        for new_labels, timestamps, columns in read_chunks(path):
+            rows = []
+            for row in range(len(timestamps)):
+                line = [str(timestamps[row])]
+                for index, column_type, label in labels:
+                    value = columns[index][row] if index in columns else None
+                    if(value is None or
+                       (column_type == "f" and math.isnan(value))):
+                        line.append("")
+                    else:
+                        line.append(str(value))
+                rows.append(line)
+            writer.writerows(rows)
+
+
+#   --------------------------------
+#
+#   Command line conversion
+#
+#   --------------------------------
+if __name__ == "__main__":
+    if(len(sys.argv) != 3):
+        print("usage: python -m serial_vis.util_lib.column_log "
+              "<input.svc> <output.csv>")
+    else:
+        to_csv(sys.argv[1], sys.argv[2])
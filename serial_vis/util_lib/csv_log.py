@@ -1,7 +1,9 @@
 # csv_logger.py
 # creates csv output log
 
+import threading
 import time
+from ..serial_lib.opcode_registry import *
 
 
 #   --------------------------------
@@ -13,7 +15,9 @@ import time
 class csv_log:
 
     """
-    CSV logging class
+    CSV logging class. Rows are queued by log_data and written by a
+    background thread in batches, so that file I/O and time formatting stay
+    off the ingest path.
 
     Attributes
     ----------
@@ -22,11 +26,27 @@ class csv_log:
     logblock_in_progress : bool
         Is a data block currently in progress?
     logcache : mixed array
-        Cache of logged data in the current block (if it exists)
+        Cache of logged data in the current block (if it exists); one
+        [label, values...] entry per label, in first-seen order. Entries are
+        kept between blocks and cleared in place.
+    logcache_index : dict
+        Index of each label's entry in logcache, keyed by label
     logcache_time : float
         Start time of a log block
     log_output_file : io file, write mode
         CSV file
+    pending : array
+        (timestamp, row) records waiting to be written; row is the rest of
+        the csv line after the timestamp, or a list of such lines sharing
+        the timestamp (log blocks)
+    ready : threading.Condition
+        Guards pending; signalled when a batch is ready or on close
+    done : bool
+        Set by close_file to stop the writer thread
+    records_written : int
+        Total number of rows written to file
+    writer : threading.Thread
+        Background writer thread
     """
 
     #   --------------------------------
@@ -51,11 +71,24 @@ class csv_log:
         # set cache
         self.logblock_in_progress = False
         self.logcache = []
+        self.logcache_index = {}
         self.logcache_time = 0
 
         # open output file
         self.log_output_file = open(self.settings.log_output_name, 'a')
 
+        # hhmmss formatting cache: (second, formatted string)
+        self.time_cache = (-1, "")
+
+        # start writer thread
+        self.pending = []
+        self.ready = threading.Condition(threading.Lock())
+        self.done = False
+        self.records_written = 0
+        self.writer = threading.Thread(target=self.write_loop)
+        self.writer.daemon = True
+        self.writer.start()
+
     #   --------------------------------
     #
     #   clean exit
@@ -64,9 +97,17 @@ class csv_log:
     def close_file(self):
 
         """
-        Cleanly exit; close the log file
+        Cleanly exit; write out any queued rows and close the log file
         """
 
+        self.ready.acquire()
+        try:
+            self.done = True
+            self.ready.notify()
+        finally:
+            self.ready.release()
+
+        self.writer.join()
         self.log_output_file.close()
 
     #   --------------------------------
@@ -85,60 +126,133 @@ class csv_log:
             instruction to be logged
         """
 
+        opid = registry.get_opid(instruction)
+
         # logstart opcode: start a log block
-        if(instruction[0] == "logstart"):
+        if(opid == LOGSTART):
             # set flag
             self.logblock_in_progress = True
             # record start time
-            self.logcache_time = self.get_time()
-            # clear cache
-            self.logcache = []
+            self.logcache_time = time.time()
+            # clear cache, keeping each label's entry
+            for datatype in self.logcache:
+                del datatype[1:]
 
         # logend opcode is called:
-        elif(instruction[0] == "logend"):
+        elif(opid == LOGEND):
             # clear flag
             self.logblock_in_progress = False
 
-            # write each entry
-            for datatype in self.logcache:
-                self.log_output_file.write(self.logcache_time)
-                for entry in datatype:
-                    self.log_output_file.write(",", entry)
-                self.log_output_file.write("\n")
+            # write every entry logged in this block as one record
+            self.write_record(
+                self.logcache_time,
+                [",".join(str(entry) for entry in datatype) + "\n"
+                 for datatype in self.logcache if len(datatype) > 1])
 
         # if a log block is in progress:
         elif(self.logblock_in_progress):
 
-            # see if it matches an existing entry in the cache
-            match = False
-            for datatype in self.logcache:
-                # match -> insert
-                if(instruction[1] == datatype[0]):
-                    datatype.append(instruction[2])
-                    match = True
+            # match -> insert
+            index = self.logcache_index.get(instruction[1])
+            if(index is not None):
+                self.logcache[index].append(instruction[2])
             # no match -> create new entry
-            if(not match):
+            else:
+                self.logcache_index[instruction[1]] = len(self.logcache)
                 self.logcache.append([instruction[1], instruction[2]])
 
         # no log block in progress => log normally.
         elif(not self.logblock_in_progress):
-            timestamp = self.get_time()
+            self.write_record(
+                time.time(),
+                instruction[1] + "," + str(instruction[2]) + "\n")
+
+    #   --------------------------------
+    #
+    #   queue a row for the writer thread
+    #
+    #   --------------------------------
+    def write_record(self, timestamp, row):
 
-            writeline = (timestamp + "," +
-                         instruction[1] + "," +
-                         str(instruction[2]) + "\n")
+        """
+        Queue a row to be written.
 
-            self.log_output_file.write(writeline)
+        Parameters
+        ----------
+        timestamp : float
+            Epoch time of the row
+        row : str or str[]
+            Rest of the csv line, including the trailing newline; or a list
+            of lines with the same timestamp
+        """
+
+        self.ready.acquire()
+        try:
+            self.pending.append((timestamp, row))
+            # only wake the writer once a full batch is available
+            if(len(self.pending) == self.settings.log_batch_size):
+                self.ready.notify()
+        finally:
+            self.ready.release()
 
     #   --------------------------------
     #
-    #   get time and format appropriately
+    #   writer thread
     #
     #   --------------------------------
-    def get_time(self):
+    def write_loop(self):
 
         """
-        Get the current epoch time, and format it accordingly
+        Write queued rows in batches. A batch is written once
+        settings.log_batch_size rows are queued, settings.log_flush_interval
+        seconds have passed, or the log is closed.
+        """
+
+        done = False
+        while(not done):
+
+            self.ready.acquire()
+            try:
+                deadline = time.time() + self.settings.log_flush_interval
+                while(not self.done and
+                      len(self.pending) < self.settings.log_batch_size):
+                    remaining = deadline - time.time()
+                    if(remaining <= 0):
+                        break
+                    self.ready.wait(remaining)
+
+                records = self.pending
+                self.pending = []
+                done = self.done
+            finally:
+                self.ready.release()
+
+            if(len(records) > 0):
+                lines = []
+                for timestamp, row in records:
+                    if(type(row) == list):
+                        prefix = self.format_time(timestamp) + ","
+                        lines += [prefix + entry for entry in row]
+                    else:
+                        lines.append(self.format_time(timestamp) + "," + row)
+                self.log_output_file.write("".join(lines))
+                self.log_output_file.flush()
+                self.records_written += len(lines)
+
+    #   --------------------------------
+    #
+    #   format time
+    #
+    #   --------------------------------
+    def format_time(self, timestamp):
+
+        """
+        Format an epoch time according to settings.time_format
+
+        Parameters
+        ----------
+        timestamp : float
+            Epoch time
 
         Returns
         -------
@@ -146,10 +260,13 @@ class csv_log:
             Formatted time
         """
 
-        epoch_time = time.time()
-
-        if(self.settings.time_format == "epoch"):
-            return(str(epoch_time))
-
         if(self.settings.time_format == "hhmmss"):
-            return(time.strftime("%H:%M:%S"))
+            # strftime is only needed once per second
+            second = int(timestamp)
+            if(second != self.time_cache[0]):
+                self.time_cache = (
+                    second,
+                    time.strftime("%H:%M:%S", time.localtime(second)))
+            return(self.time_cache[1])
+
+        return(str(timestamp))
@@ -93,6 +93,14 @@ class error_handler:
         "nub": (
             "Warning: attempted to write null buffer",
             "Attempted to save null buffer to file. Check save index."
+        ),
+        "nnp": (
+            "Warning: numpy not installed",
+            "Plotting requires numpy; & was not plotted."
+        ),
+        "dnf": (
+            "Warning: device not found",
+            "No device named & is registered."
         )
     }
 
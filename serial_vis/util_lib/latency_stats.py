@@ -0,0 +1,130 @@
+# latency_stats.py
+# rolling latency statistics for the serial -> screen pipeline
+
+
+#   --------------------------------
+#
+#   Latency statistics
+#
+#   --------------------------------
+
+class latency_stats:
+
+    """
+    Rolling latency statistics for one device. Each sample is one displayed
+    frame, timestamped at each stage of the pipeline.
+
+    Attributes
+    ----------
+    stages : str[]
+        Pipeline stages, in order. The latency of a stage is the time between
+        the previous stage (or "read", for the first stage) and that stage.
+
+    Created by __init__:
+    size : int
+        Number of samples kept for each stage
+    samples : dict
+        Ring buffer of latencies (seconds) for each stage, plus "total"
+    index : int
+        Position of the next sample in the ring buffers
+    count : int
+        Number of valid samples in the ring buffers
+    """
+
+    stages = ["parse", "enqueue", "dequeue", "commit", "display"]
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, size):
+
+        """
+        Create a latency tracker
+
+        Parameters
+        ----------
+        size : int
+            Number of frames to compute statistics over
+        """
+
+        self.size = size
+        self.samples = {}
+        for stage in self.stages + ["total"]:
+            self.samples[stage] = [0.0] * size
+        self.index = 0
+        self.count = 0
+
+    #   --------------------------------
+    #
+    #   Add sample
+    #
+    #   --------------------------------
+    def add(self, stamps):
+
+        """
+        Record the stage timestamps of a displayed frame.
+
+        Parameters
+        ----------
+        stamps : dict
+            Time (as time.time()) that the frame's draw instruction reached
+            "read" and each entry in stages
+        """
+
+        previous = stamps["read"]
+        for stage in self.stages:
+            self.samples[stage][self.index] = stamps[stage] - previous
+            previous = stamps[stage]
+        self.samples["total"][self.index] = stamps["display"] - stamps["read"]
+
+        self.index = (self.index + 1) % self.size
+        if(self.count < self.size):
+            self.count += 1
+
+    #   --------------------------------
+    #
+    #   Compute percentiles
+    #
+    #   --------------------------------
+    def percentile(self, stage, percent):
+
+        """
+        Get a latency percentile for a stage.
+
+        Parameters
+        ----------
+        stage : str
+            Entry in stages, or "total"
+        percent : float
+            Percentile to compute, 0 to 100
+
+        Returns
+        -------
+        float
+            Latency in seconds; 0 if there are no samples
+        """
+
+        if(self.count == 0):
+            return(0.0)
+
+        ordered = sorted(self.samples[stage][:self.count])
+        return(ordered[int(round(percent / 100.0 * (self.count - 1)))])
+
+    def summary(self):
+
+        """
+        Get the median and 99th percentile latency of every stage.
+
+        Returns
+        -------
+        dict
+            (p50, p99) in seconds, keyed by stage; includes "total"
+        """
+
+        output = {}
+        for stage in self.stages + ["total"]:
+            output[stage] = (
+                self.percentile(stage, 50), self.percentile(stage, 99))
+        return(output)
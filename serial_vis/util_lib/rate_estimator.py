@@ -0,0 +1,141 @@
+# rate_estimator.py
+# rolling event rate and interval jitter
+
+
+#   --------------------------------
+#
+#   Rate estimator
+#
+#   --------------------------------
+
+class rate_estimator:
+
+    """
+    Rolling rate estimator. Keeps a ring buffer of the intervals between
+    the most recent events, with a running sum and sum of squares, so that
+    adding an event and reading the rate are both O(1).
+
+    Attributes
+    ----------
+    Created by __init__:
+    size : int
+        Number of intervals kept
+    intervals : float[]
+        Ring buffer of intervals (seconds)
+    index : int
+        Position of the next interval in the ring buffer
+    count : int
+        Number of valid intervals in the ring buffer
+    total : float
+        Sum of the valid intervals
+    total_squares : float
+        Sum of the squares of the valid intervals
+    last_time : float
+        Time of the most recent event; None if there has been none
+    """
+
+    #   --------------------------------
+    #
+    #   Initialization
+    #
+    #   --------------------------------
+    def __init__(self, size):
+
+        """
+        Create a rate estimator
+
+        Parameters
+        ----------
+        size : int
+            Number of intervals to compute statistics over
+        """
+
+        self.size = max(size, 1)
+        self.intervals = [0.0] * self.size
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.last_time = None
+
+    #   --------------------------------
+    #
+    #   Add event
+    #
+    #   --------------------------------
+    def add(self, event_time):
+
+        """
+        Record an event.
+
+        Parameters
+        ----------
+        event_time : float
+            Time of the event, as time.time()
+        """
+
+        if(self.last_time is None):
+            self.last_time = event_time
+            return
+
+        interval = event_time - self.last_time
+        self.last_time = event_time
+
+        # replace the oldest interval once the buffer is full
+        if(self.count == self.size):
+            old = self.intervals[self.index]
+            self.total -= old
+            self.total_squares -= old * old
+        else:
+            self.count += 1
+
+        self.intervals[self.index] = interval
+        self.total += interval
+        self.total_squares += interval * interval
+
+        self.index += 1
+        if(self.index == self.size):
+            self.index = 0
+            # recompute the sums once per lap, so that rounding errors from
+            # the running updates don't accumulate
+            self.total = sum(self.intervals)
+            self.total_squares = sum(x * x for x in self.intervals)
+
+    #   --------------------------------
+    #
+    #   Statistics
+    #
+    #   --------------------------------
+    def rate(self):
+
+        """
+        Returns the event rate.
+
+        Returns
+        -------
+        float
+            Events per second over the kept intervals; 0 if unknown
+        """
+
+        if(self.count == 0 or self.total <= 0):
+            return(0)
+        return(self.count / self.total)
+
+    def jitter(self):
+
+        """
+        Returns inter-event interval statistics.
+
+        Returns
+        -------
+        (float, float, float)
+            Mean, standard deviation and maximum of the kept intervals
+            (seconds); all 0 if there are none
+        """
+
+        if(self.count == 0):
+            return((0, 0, 0))
+
+        mean = self.total / self.count
+        variance = max(self.total_squares / self.count - mean * mean, 0)
+        return((mean, variance ** 0.5, max(self.intervals[:self.count])))
@@ -37,19 +37,40 @@ class sv_settings(settings_template):
     verify = 2
     confirmation = True
 
+    # threaded_serial
+    queue_size = 50000
+    queue_policy = "drop_frame"
+    track_latency = True
+
     # vector_graphics_window
     window_size = (800, 600)
     scale = 1.000
     offset = (0, 0)
     frame_limit = 60
     line_width = 2
+    polyline_min_segments = 16
+    cull_min_ops = 256
+    layer_cache = True
+    static_layer = True
+    static_min_frames = 5
+    static_min_ops = 64
     font = "freemono"
     show_frame_id = True
     show_fps = True
     fps_count_keyword = "draw"
     fps_smooth_size = 30
+    show_latency = False
+    latency_window = 500
+    show_stats = False
+    stats_interval = 1.0
+    stats_sample_interval = 30
+    plot_labels = []
+    plot_size = 10000
+    plot_height = 100
+    plot_colors = [(0, 0, 255), (255, 0, 0), (0, 150, 0), (200, 120, 0)]
     font_size = 15
     display_spacing = [10, 10, 10, 10, 10]
+    info_refresh_rate = 4
     events = {
         pygame.QUIT: ("quit",),
         pygame.K_SPACE: ("pause",),
@@ -57,27 +78,56 @@ class sv_settings(settings_template):
         pygame.K_LEFTBRACKET: ("view", -10),
         pygame.K_COMMA: ("view", -1),
         pygame.K_RIGHTBRACKET: ("view", 10),
-        pygame.K_BACKQUOTE: ("cmd",)
+        pygame.K_BACKQUOTE: ("cmd",),
+        pygame.K_HOME: ("resetview",)
     }
+    mouse_view = True
+    zoom_step = 1.25
+    zoom_min = 0.01
+    zoom_max = 100.0
+    view_zoom = 1.0
+    view_pan = (0, 0)
     colors = {
         "black": (0, 0, 0),
         "white": (255, 255, 255),
         "background": (255, 255, 255)
     }
 
-    # csv_log
+    # csv_log, column_log; log_format is "csv", "column" or "both"
+    log_format = "csv"
     log_output_name = "serial_log.csv"
+    column_log_name = "serial_log.svc"
+    column_chunk_size = 4096
     time_format = "epoch"
+    log_batch_size = 512
+    log_flush_interval = 0.5
+
+    # buffer_manager
+    ingest_mode = "coalesce"
+    threaded_ingest = True
+    ingest_rate = 1000
+
+    # buffer_manager triggers; trigger_conditions are described in
+    # buffer_lib.trigger
+    trigger_conditions = []
+    trigger_pre_frames = 0
+    trigger_post_frames = 0
+    trigger_pause = True
+    trigger_save_name = ""
 
     # buffer_db
     max_size_forward = 100
     max_size_backward = 100
+    delta_history = True
+    keyframe_interval = 30
+    delta_cache_size = 16
     default_save_name = "saved_buffer.svb"
     default_save_mode = "a"
 
     # serial_parser
     serial_mode = "ascii"
     number_mode = "hex"
+    parse_cache_size = 4096
 
     # error_handler
     error_codes = {
@@ -95,4 +145,6 @@ class sv_settings(settings_template):
         "cto": True,
         "ddc": True,
         "nub": True,
+        "nnp": True,
+        "dnf": True,
     }
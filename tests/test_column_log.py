@@ -0,0 +1,50 @@
+# test_column_log.py
+# round trip of the columnar log through to_csv
+
+import csv
+from serial_vis.util_lib import column_log
+from serial_vis.util_lib.column_log import to_csv
+
+
+class settings:
+    column_chunk_size = 4096
+
+
+def write_session(path, values):
+
+    """
+    Write one logging session, one logf or logs row per (label, value).
+    """
+
+    session_settings = settings()
+    session_settings.column_log_name = path
+    log = column_log(session_settings)
+    for label, value in values:
+        if(type(value) == str):
+            log.log_data(["logs", label, value])
+        else:
+            log.log_data(["logf", label, value])
+    log.close_file()
+
+
+def test_two_sessions(tmp_path):
+
+    path = str(tmp_path / "log.svc")
+    csv_path = str(tmp_path / "log.csv")
+
+    # second session sees the labels in a different order, and adds one
+    write_session(path, [("a", 1.0), ("b", 2.0)])
+    write_session(path, [("b", 3.0), ("c", "x"), ("a", 4.0)])
+    to_csv(path, csv_path)
+
+    with open(csv_path, newline="") as infile:
+        rows = list(csv.reader(infile))
+
+    assert(rows[0] == ["time", "a", "b", "c"])
+    values = [row[1:] for row in rows[1:]]
+    assert(values == [
+        ["1.0", "", ""],
+        ["", "2.0", ""],
+        ["", "3.0", ""],
+        ["", "", "x"],
+        ["4.0", "", ""]])
@@ -0,0 +1,82 @@
+# test_multi_device.py
+# several devices ingesting into one buffer_manager at once
+
+import time
+from serial_vis.buffer_lib import buffer_manager
+from serial_vis.util_lib import sv_settings, error_handler
+
+FRAMES = 20
+SIZE = 50
+
+
+def make_stream(device):
+
+    """
+    Instructions of FRAMES frames; every line is unique to its device and
+    frame.
+    """
+
+    stream = []
+    for frame in range(FRAMES):
+        for i in range(SIZE):
+            stream.append(
+                ["drawline", [device, frame], [i, i + 1], "black"])
+        stream.append(["draw"])
+    return(stream)
+
+
+def ingest(count):
+
+    """
+    Ingest count devices, a few instructions of each device at a time, so
+    that their frames are built concurrently.
+
+    Returns
+    -------
+    (buffer_manager, dict, float)
+        Manager, stream of each device, and ingest time in seconds
+    """
+
+    names = ["device" + str(i) for i in range(count)]
+    settings = {"main": sv_settings()}
+    for name in names:
+        settings[name] = sv_settings()
+    manager = buffer_manager(settings, error_handler(settings["main"]))
+    streams = {name: make_stream(i) for i, name in enumerate(names)}
+
+    start = time.perf_counter()
+    for offset in range(0, len(streams[names[0]]), 7):
+        for name in names:
+            for instruction in streams[name][offset:offset + 7]:
+                manager.update(name, instruction)
+    return(manager, streams, time.perf_counter() - start)
+
+
+def test_frames_isolated():
+
+    manager, streams, elapsed = ingest(4)
+
+    for name, stream in streams.items():
+        db = manager.buffer_db[name]
+        assert(db.input_buffer == FRAMES)
+
+        expected = []
+        frame = []
+        for instruction in stream:
+            if(instruction[0] == "draw"):
+                expected.append(frame)
+                frame = []
+            else:
+                frame.append(instruction)
+
+        stored = [db.get_buffer(i).instructions for i in range(FRAMES)]
+        assert(stored == expected)
+
+
+def test_time_per_device():
+
+    # best of a few runs; the bound is loose, to catch per-device work
+    # that grows with the number of devices rather than timing noise
+    single = min(ingest(1)[2] for i in range(3))
+    multiple = min(ingest(4)[2] for i in range(3))
+    assert(multiple / 4 < 3 * single)
@@ -0,0 +1,80 @@
+# test_threaded_serial.py
+# reader loop of threaded_serial, with an in-memory device
+
+import pytest
+import time
+from serial_vis.serial_lib import threaded_serial
+from serial_vis.util_lib import sv_settings, error_handler
+
+
+class memory_device:
+
+    """
+    Stands in for a serial device; returns the given lines, then stops the
+    reader.
+    """
+
+    def __init__(self, reader, lines):
+        self.reader = reader
+        self.lines = list(lines)
+        self.read_time = 0
+
+    def get_line(self):
+        self.read_time = time.time()
+        if(len(self.lines) == 1):
+            self.reader.done = True
+        return([self.lines.pop(0), True])
+
+    def close(self):
+        pass
+
+
+# bin_parser.process_line is not implemented yet, so bin mode queues
+# nothing; the reader must still parse and time every line
+@pytest.mark.parametrize("mode, lines, queued", [
+    ("ascii", ["drawline:1,2:3,4:black", "draw"], 2),
+    ("bin", [b"\x0a", b"\x00"], 0)])
+def test_reader_latency(mode, lines, queued):
+
+    settings = sv_settings()
+    settings.serial_mode = mode
+    settings.track_latency = True
+    settings.verify = 0
+
+    reader = threaded_serial(settings, error_handler(settings), {})
+    reader.serial_device = memory_device(reader, lines)
+    reader.device_connected = True
+    reader.run()
+
+    assert(reader.instruction_count == len(lines))
+    assert(reader.parse_seconds >= 0)
+    stamps = [stamp for instruction, stamp in reader.get_instructions()]
+    assert(len(stamps) == queued)
+    assert(all(stamp[0] <= stamp[1] <= stamp[2] for stamp in stamps))
+
+
+@pytest.mark.parametrize("policy", ["drop_frame", "drop_instruction"])
+def test_overflow_draw_count(policy):
+
+    settings = sv_settings()
+    settings.queue_size = 8
+    settings.queue_policy = policy
+    settings.track_latency = False
+
+    reader = threaded_serial(settings, error_handler(settings), {})
+    stream = (["logf", "a", 1.0], ["logf", "b", 2.0], ["draw"]) * 20
+    for instruction in stream:
+        reader.enqueue(list(instruction))
+        draws = sum(
+            1 for entry in reader.instruction_buffer if entry[0][0] == "draw")
+        assert(reader.queued_draws == draws)
+        assert(len(reader.instruction_buffer) <= settings.queue_size)
+
+    # a log-only stream never has a frame to drop
+    reader.get_instructions()
+    assert(reader.queued_draws == 0)
+    dropped_frames = reader.dropped_frames
+    for i in range(20):
+        reader.enqueue(["logf", "a", float(i)])
+    assert(reader.queued_draws == 0)
+    assert(reader.dropped_frames == dropped_frames)